@@ -0,0 +1,292 @@
+import atexit
+import os
+import random
+import threading
+from typing import Dict, List, Tuple
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.db.transaction import atomic
+from django.utils import timezone
+from .caching import bump_versions, category_scope
+from .sorting import hot_score, best_score
+from .models import BingoCard, BingoCardCategory, BingoResult, BingoTile, SiteUser, TileCounter
+
+# a result and the ids of its 25 tiles, in mask bit order
+PendingResult = Tuple[BingoResult, List[int]]
+# tiles per statement, under the bound parameter limits
+COUNTER_BATCH_SIZE = 200
+
+
+def apply_vote_deltas(deltas: Dict[int, List[int]]):
+    '''
+    Applies {card id: [ups delta, total delta]} to the cards and their authors
+    with one bulk_update per table.
+    '''
+
+    with atomic():
+        # lock in id order so concurrent flushes can't deadlock
+        cards = list(BingoCard.objects
+                     .select_for_update()
+                     .filter(id__in=deltas)
+                     .only('id', 'author_id', 'created_timestamp', 'ups', 'votes_total', 'score')
+                     .order_by('id'))
+
+        now = timezone.now()
+        author_deltas = {}
+        for card in cards:
+            ups_delta, total_delta = deltas[card.id]
+            score_delta = ups_delta - (total_delta - ups_delta)
+
+            card.ups += ups_delta
+            card.votes_total += total_delta
+            card.score += score_delta
+            card.hot = hot_score(card.ups, card.votes_total, card.created_timestamp)
+            card.best = best_score(card.ups, card.votes_total)
+            card.edited_at = now
+
+            author_deltas[card.author_id] = author_deltas.get(card.author_id, 0) + score_delta
+
+        BingoCard.objects.bulk_update(cards, ['score', 'hot', 'best', 'ups', 'votes_total', 'edited_at'])
+
+        authors = list(SiteUser.objects
+                       .select_for_update()
+                       .filter(id__in=[i for i, d in author_deltas.items() if d])
+                       .only('id', 'score')
+                       .order_by('id'))
+
+        for author in authors:
+            author.score += author_deltas[author.id]
+
+        SiteUser.objects.bulk_update(authors, ['score'])
+        bump_versions('cards', *(f'card:{card.id}' for card in cards))
+        bump_author_categories([author.id for author in authors])
+
+
+def bump_author_categories(author_ids: List[int]):
+    '''Invalidates the categories of authors whose score changed, they show it.'''
+    if not author_ids:
+        return
+    names = BingoCardCategory.objects.filter(author_id__in=author_ids).values_list('name', flat=True)
+    bump_versions(*(category_scope(name) for name in names))
+
+
+def apply_results(results: List[PendingResult]):
+    '''
+    Saves results with one bulk_create and adds their tile hits and
+    exposures to one randomly picked shard of each tile's counters. Results
+    of cards deleted since are dropped.
+    '''
+
+    card_ids = {result.card_id for result, _ in results if result.card_id}
+    live_cards = set(BingoCard.objects.filter(id__in=card_ids).values_list('id', flat=True)) if card_ids else set()
+
+    counts = {}
+    saved = []
+    for result, tile_ids in results:
+        if result.card_id and result.card_id not in live_cards:
+            continue
+        saved.append(result)
+        for bit, tile_id in enumerate(tile_ids):
+            count = counts.setdefault(tile_id, [0, 0])
+            count[0] += result.mask >> bit & 1
+            count[1] += 1
+
+    tile_ids = list(counts)
+    live_tiles = [tile_id
+                  for start in range(0, len(tile_ids), COUNTER_BATCH_SIZE)
+                  for tile_id in BingoTile.objects
+                  .filter(id__in=tile_ids[start:start + COUNTER_BATCH_SIZE])
+                  .values_list('id', flat=True)]
+    counts = {tile_id: counts[tile_id] for tile_id in live_tiles}
+
+    with atomic():
+        BingoResult.objects.bulk_create(saved)
+        add_tile_counts(counts, random.randrange(settings.TILE_COUNTER_SHARDS))
+
+
+def add_tile_counts(counts: Dict[int, List[int]], shard: int):
+    '''Adds {tile id: [hits, exposures]} to one shard of the tiles' counters.'''
+
+    if not counts:
+        return
+
+    rows = sorted(counts.items())  # same lock order in every transaction
+    if connection.vendor in ('postgresql', 'sqlite'):
+        table = TileCounter._meta.db_table
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), COUNTER_BATCH_SIZE):
+                batch = rows[start:start + COUNTER_BATCH_SIZE]
+                cursor.execute(f'''
+                    INSERT INTO {table} (tile_id, shard, hits, exposures)
+                    VALUES {', '.join(['(%s, %s, %s, %s)'] * len(batch))}
+                    ON CONFLICT (tile_id, shard) DO UPDATE
+                    SET hits = {table}.hits + EXCLUDED.hits,
+                        exposures = {table}.exposures + EXCLUDED.exposures
+                ''', [value for tile_id, (hits, exposures) in batch for value in (tile_id, shard, hits, exposures)])
+        return
+
+    for tile_id, (hits, exposures) in rows:
+        TileCounter.objects.get_or_create(tile_id=tile_id, shard=shard)
+        TileCounter.objects.filter(tile_id=tile_id, shard=shard).update(
+            hits=F('hits') + hits, exposures=F('exposures') + exposures)
+
+
+class WriteBuffer:
+    '''
+    Collects writes in memory and applies them in batches. A background
+    thread flushes every `interval` seconds, or sooner once `max_pending`
+    entries are waiting. Subclasses say how entries merge and are written.
+    '''
+
+    thread_name = 'write-buffer'
+    # whether a failed flush puts its entries back for the next one
+    retry_failed = True
+    # whether flushes call _apply with nothing pending
+    apply_empty = False
+
+    def __init__(self, interval: float, max_pending: int, background: bool = True):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.background = background
+
+        self._pending = self._empty()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def flush(self) -> int:
+        '''
+        Writes everything buffered so far. Returns the number of entries written.
+        '''
+
+        with self._lock:
+            pending, self._pending = self._pending, self._empty()
+
+        if not pending and not self.apply_empty:
+            return 0
+
+        try:
+            self._apply(pending)
+        except Exception:
+            # put the entries back so the next flush retries them
+            if self.retry_failed:
+                with self._lock:
+                    self._merge(pending)
+            raise
+
+        return len(pending)
+
+    def _add(self, entries):
+        with self._lock:
+            self._merge(entries)
+            pending = len(self._pending)
+
+        if self.background:
+            self._ensure_thread()
+            if pending >= self.max_pending:
+                self._wake.set()
+
+    def _empty(self):
+        raise NotImplementedError
+
+    def _merge(self, entries):
+        raise NotImplementedError
+
+    def _apply(self, pending):
+        raise NotImplementedError
+
+    def _ensure_thread(self):
+        # threads don't survive a fork, so each worker process starts its own
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as err:
+                print(f'{self.thread_name} flush failed: {err}')
+            finally:
+                close_old_connections()
+
+
+class VoteBuffer(WriteBuffer):
+    '''
+    Collects vote deltas per card in memory and writes them in batches.
+
+    The votes themselves are saved as usual, only the card and author score
+    columns lag behind.
+    '''
+
+    thread_name = 'vote-buffer'
+
+    def add(self, card_id: int, ups_delta: int, total_delta: int):
+        self._add({card_id: [ups_delta, total_delta]})
+
+    def _empty(self) -> Dict[int, List[int]]:
+        return {}
+
+    def _merge(self, deltas: Dict[int, List[int]]):
+        for card_id, (ups_delta, total_delta) in deltas.items():
+            delta = self._pending.setdefault(card_id, [0, 0])
+            delta[0] += ups_delta
+            delta[1] += total_delta
+
+    def _apply(self, deltas: Dict[int, List[int]]):
+        apply_vote_deltas(deltas)
+
+
+class ResultBuffer(WriteBuffer):
+    '''
+    Collects bingo results in memory and saves them, with their tile
+    counts, in batches.
+    '''
+
+    thread_name = 'result-buffer'
+    # results are statistics, better to lose a batch than to retry one that
+    # can't be written forever
+    retry_failed = False
+
+    def add(self, result: BingoResult, tile_ids: List[int]):
+        self._add([(result, tile_ids)])
+
+    def _empty(self) -> List[PendingResult]:
+        return []
+
+    def _merge(self, results: List[PendingResult]):
+        self._pending.extend(results)
+
+    def _apply(self, results: List[PendingResult]):
+        apply_results(results)
+
+
+vote_buffer = VoteBuffer(
+    interval=settings.VOTE_BUFFER_INTERVAL / 1000,
+    max_pending=settings.VOTE_BUFFER_MAX_PENDING,
+)
+
+result_buffer = ResultBuffer(
+    interval=settings.RESULT_BUFFER_INTERVAL / 1000,
+    max_pending=settings.RESULT_BUFFER_MAX_PENDING,
+)
+
+
+@atexit.register
+def flush_buffers():
+    for buffer in [vote_buffer, result_buffer]:
+        try:
+            buffer.flush()
+        except Exception as err:
+            print(f'{buffer.thread_name} flush failed: {err}')
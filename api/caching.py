@@ -0,0 +1,189 @@
+'''
+HTTP caching: a response cache for GET requests, and conditional GETs for
+detail views.
+
+Views list the version scopes their responses depend on, like "cards" or
+"card:{pk}", and the version of each scope is part of the cache key. Signals
+bump those versions when the underlying rows change, which orphans every
+response that was built from the old data. Responses also expire after
+RESPONSE_CACHE_TTL seconds, for writes that don't send signals.
+'''
+
+import hashlib
+import threading
+import time
+from typing import List
+from django.conf import settings
+from django.core.cache import caches
+from django.db.transaction import on_commit
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.request import Request
+
+response_cache = caches['responses']
+
+
+def version_key(scope: str) -> str:
+    return f'version:{scope}'
+
+
+def bump_versions(*scopes: str):
+    '''Invalidates the cached responses of `scopes` once the current transaction commits.'''
+
+    def bump():
+        for scope in scopes:
+            try:
+                response_cache.incr(version_key(scope))
+            except ValueError:
+                # not set yet, nothing cached under it can be current
+                response_cache.add(version_key(scope), time.time_ns(), timeout=None)
+
+    on_commit(bump)
+
+
+def category_scope(name: str) -> str:
+    # category URLs match names in any case
+    return f'category:{name.lower()}'
+
+
+def current_versions(scopes: List[str]) -> List[int]:
+    keys = [version_key(s) for s in scopes]
+    versions = response_cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            # start from the clock so a lost version can't match old entries
+            response_cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = response_cache.get(key)
+
+    return [versions[k] for k in keys]
+
+
+class CacheStats:
+    '''Hits, misses and time spent answering them in this worker.'''
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, hit: bool, duration: float):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_time += duration
+            else:
+                self.misses += 1
+                self.miss_time += duration
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio,
+            'hit_ms': self.hit_time / self.hits * 1000 if self.hits else None,
+            'miss_ms': self.miss_time / self.misses * 1000 if self.misses else None,
+        }
+
+
+cache_stats = CacheStats()
+
+
+class CachedResponseMixin:
+    '''
+    Serves GET requests from the response cache, shared by every user since
+    viewer state is fetched separately from the viewer endpoint.
+    `cache_scopes` are formatted with the view's URL kwargs. Responses say
+    whether they were a hit in an X-Cache header and how long they took in
+    Server-Timing.
+    '''
+
+    cache_scopes: List[str] = []
+
+    def get(self, request: Request, *args, **kwargs):
+        self.cache_state = None
+        if not self.is_cacheable(request):
+            return super().get(request, *args, **kwargs)
+
+        start = time.perf_counter()
+        key = self.cache_key(request, kwargs)
+        cached = response_cache.get(key)
+        self.cache_state = (key, cached is not None, start)
+
+        if cached is None:
+            return super().get(request, *args, **kwargs)
+
+        status, content_type, content = cached
+        return HttpResponse(content, status=status, content_type=content_type)
+
+    def finalize_response(self, request: Request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'cache_state', None) is None:
+            return response
+
+        key, hit, start = self.cache_state
+        if not hit and response.status_code == 200 and not response.cookies:
+            response.render()
+            response_cache.set(key, (response.status_code, response['Content-Type'], response.content),
+                               settings.RESPONSE_CACHE_TTL)
+
+        duration = time.perf_counter() - start
+        cache_stats.record(hit, duration)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        timing = f'cache;desc={response["X-Cache"]};dur={duration * 1000:.2f}'
+        response['Server-Timing'] = ', '.join(filter(None, [response.get('Server-Timing'), timing]))
+        return response
+
+    def is_cacheable(self, request: Request) -> bool:
+        return settings.RESPONSE_CACHE
+
+    def get_cache_scopes(self, kwargs) -> List[str]:
+        return [scope.format(**kwargs) for scope in self.cache_scopes]
+
+    def cache_key(self, request: Request, kwargs) -> str:
+        # same params in any order share an entry, the Accept header picks the renderer
+        query = sorted((k, sorted(v)) for k, v in request.query_params.lists())
+        scopes = self.get_cache_scopes(kwargs)
+        raw = f'{request.path}|{query}|{request.META.get("HTTP_ACCEPT", "")}|{current_versions(scopes)}'
+        return 'response:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+class ConditionalGetMixin:
+    '''
+    ETag and Last-Modified for detail views. `get_version(request)` returns
+    the cheap data the response depends on (counters, timestamps) plus a
+    last modified datetime or None, or None when
+    the object doesn't exist. Matching If-None-Match or If-Modified-Since
+    headers get a 304 before anything is serialized.
+    '''
+
+    def get_version(self, request: Request):
+        raise NotImplementedError
+
+    def get(self, request: Request, *args, **kwargs):
+        version = self.get_version(request)
+        if version is None:
+            return super().get(request, *args, **kwargs)
+
+        state, last_modified = version
+        etag = quote_etag(hashlib.md5(repr(state).encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        # revalidate every time, the validators are cheaper than the body
+        patch_cache_control(response, no_cache=True)
+        return response
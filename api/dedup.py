@@ -0,0 +1,266 @@
+'''
+First result per session, checked with Bloom filters instead of the
+database.
+
+Results are keyed on who sent them (a user, or a hashed session key), the
+card and the seed. Each RESULT_DEDUP_BUCKET seconds get a new filter, and a
+key counts as seen while it's in any of the last RESULT_DEDUP_WINDOW
+filters. Filters are sized so that with RESULT_DEDUP_CAPACITY keys in each,
+a new key is wrongly taken for a repeat at most RESULT_DEDUP_ERROR_RATE of
+the time, across the whole window. A check hashes the key once and tests a
+fixed number of bits per filter, whatever the volume.
+
+Every RESULT_DEDUP_PERSIST_INTERVAL seconds, a worker that has checked keys
+ORs the keys it took into the ResultFilter rows and the rows back into its
+filters, which is how workers learn about each other's keys. Until then a
+result sent twice to two workers can count twice. rebuild_result_filters
+refills the rows from the results log.
+'''
+
+import atexit
+import hashlib
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from django.conf import settings
+from django.db.transaction import atomic
+from .buffers import WriteBuffer
+from .models import ResultFilter
+
+
+def result_key(session: str, card_id: Optional[int], category_id: int, seed: Optional[int]) -> bytes:
+    return f'{session}:{card_id or ""}:{category_id}:{"" if seed is None else seed}'.encode()
+
+
+def session_id(session_key: str) -> str:
+    '''What results store instead of the session key itself.'''
+    return 'session:' + hashlib.blake2b(session_key.encode(), digest_size=16).hexdigest()
+
+
+class BloomFilter:
+    def __init__(self, size: int, hashes: int, bits: bytes = None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> 'BloomFilter':
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hashes)
+
+    def positions(self, key: bytes) -> List[int]:
+        '''The bits of `key`, by double hashing one 128 bit digest.'''
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def contains(self, positions: List[int]) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add(self, positions: List[int]):
+        bits = self.bits
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def fits(self, hashes: int, bits: bytes) -> bool:
+        '''Whether stored bits were made with the same size and hash count.'''
+        return hashes == self.hashes and len(bits) == len(self.bits)
+
+    def merge(self, bits: bytes):
+        merged = int.from_bytes(self.bits, 'little') | int.from_bytes(bits, 'little')
+        self.bits = bytearray(merged.to_bytes(len(self.bits), 'little'))
+
+
+class ResultFilters(WriteBuffer):
+    '''
+    The filters of the current window. Pending entries are the buckets that
+    took keys since the last persist. Flushes with none still read the rows,
+    for the keys other workers took.
+    '''
+
+    thread_name = 'result-filters'
+    apply_empty = True
+
+    def __init__(self, capacity: int, error_rate: float, bucket_seconds: int, window: int,
+                 interval: float, background: bool = True):
+        super().__init__(interval, max_pending=window + 1, background=background)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bucket_seconds = bucket_seconds
+        self.window = window
+
+        # a new key is tested against every filter of the window
+        self._template = BloomFilter.for_capacity(capacity, error_rate / window)
+        self._filters: Dict[int, BloomFilter] = {}
+        self._reserved: Set[bytes] = set()  # keys whose results are being saved
+        self._filters_lock = threading.Lock()
+        self._loaded = False
+
+    def first_seen(self, key: bytes, at: float = None) -> bool:
+        '''Records `key`, returns False when it was (probably) seen before.'''
+
+        self._ensure_loaded()
+        bucket = self.bucket(at or time.time())
+        positions = self._template.positions(key)
+
+        with self._filters_lock:
+            self._expire(bucket)
+            if key in self._reserved or any(f.contains(positions) for f in self._filters.values()):
+                return False
+            self._filter(bucket).add(positions)
+
+        self._add({bucket})
+        return True
+
+    def reserve(self, key: bytes, at: float = None) -> bool:
+        '''
+        Like first_seen, but `key` is only held until it's recorded, once its
+        result is saved, or released when the save fails. Filter bits can't
+        be taken back.
+        '''
+
+        self._ensure_loaded()
+        bucket = self.bucket(at or time.time())
+        positions = self._template.positions(key)
+
+        with self._filters_lock:
+            self._expire(bucket)
+            if key in self._reserved or any(f.contains(positions) for f in self._filters.values()):
+                return False
+            self._reserved.add(key)
+            return True
+
+    def record(self, key: bytes, at: float = None):
+        bucket = self.bucket(at or time.time())
+        positions = self._template.positions(key)
+
+        with self._filters_lock:
+            self._filter(bucket).add(positions)
+            self._reserved.discard(key)
+
+        self._add({bucket})
+
+    def release(self, key: bytes):
+        with self._filters_lock:
+            self._reserved.discard(key)
+
+    def bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def oldest_bucket(self, bucket: int = None) -> int:
+        return (bucket or self.bucket(time.time())) - self.window + 1
+
+    def build(self, keys: Iterable[Tuple[bytes, float]]) -> Dict[int, BloomFilter]:
+        '''Filters holding (key, timestamp) pairs of the current window.'''
+        oldest = self.oldest_bucket()
+        filters = {}
+        for key, timestamp in keys:
+            bucket = self.bucket(timestamp)
+            if bucket >= oldest:
+                if bucket not in filters:
+                    filters[bucket] = self._empty_filter()
+                filters[bucket].add(self._template.positions(key))
+        return filters
+
+    def clear(self):
+        with self._filters_lock:
+            self._filters = {}
+            self._loaded = False
+
+    def _empty(self) -> set:
+        return set()
+
+    def _merge(self, buckets: set):
+        self._pending.update(buckets)
+
+    def _apply(self, dirty: set):
+        '''
+        Swaps bits with the stored filters. Only the rows of buckets that
+        took keys are locked, the rest of the window is read without locks.
+        '''
+
+        if dirty:
+            self._push(dirty)
+        # nothing to read before the first check
+        if self._loaded:
+            self._pull(skip=dirty)
+
+    def _push(self, dirty: set):
+        oldest = self.oldest_bucket()
+        template = self._template
+        buckets = [bucket for bucket in dirty if bucket >= oldest]
+
+        with atomic():
+            ResultFilter.objects.bulk_create([
+                ResultFilter(bucket=bucket, hashes=template.hashes, bits=b'')
+                for bucket in buckets
+            ], ignore_conflicts=True)
+
+            rows = list(ResultFilter.objects
+                        .select_for_update()
+                        .filter(bucket__in=buckets)
+                        .order_by('bucket'))
+
+            with self._filters_lock:
+                for row in rows:
+                    if template.fits(row.hashes, bytes(row.bits)):
+                        self._filter(row.bucket).merge(bytes(row.bits))
+                    row.bits = bytes(self._filter(row.bucket).bits)
+                    row.hashes = template.hashes
+
+            ResultFilter.objects.bulk_update(rows, ['bits', 'hashes'])
+            ResultFilter.objects.filter(bucket__lt=oldest).delete()
+
+    def _ensure_loaded(self):
+        if self.background:
+            # keeps pulling other workers' keys, even while this one takes none
+            self._ensure_thread()
+        if not self._loaded:
+            self._pull()
+
+    def _pull(self, skip: Iterable[int] = ()):
+        '''ORs the stored filters of the window, but the `skip` buckets, into this worker's.'''
+
+        rows = list(ResultFilter.objects
+                    .filter(bucket__gte=self.oldest_bucket())
+                    .exclude(bucket__in=skip)
+                    .values_list('bucket', 'hashes', 'bits'))
+        with self._filters_lock:
+            for bucket, hashes, bits in rows:
+                if self._template.fits(hashes, bytes(bits)):
+                    self._filter(bucket).merge(bytes(bits))
+            self._loaded = True
+
+    def _filter(self, bucket: int) -> BloomFilter:
+        if bucket not in self._filters:
+            self._filters[bucket] = self._empty_filter()
+        return self._filters[bucket]
+
+    def _empty_filter(self) -> BloomFilter:
+        return BloomFilter(self._template.size, self._template.hashes)
+
+    def _expire(self, bucket: int):
+        oldest = self.oldest_bucket(bucket)
+        for old in [b for b in self._filters if b < oldest]:
+            del self._filters[old]
+
+
+result_filters = ResultFilters(
+    capacity=settings.RESULT_DEDUP_CAPACITY,
+    error_rate=settings.RESULT_DEDUP_ERROR_RATE,
+    bucket_seconds=settings.RESULT_DEDUP_BUCKET,
+    window=settings.RESULT_DEDUP_WINDOW,
+    interval=settings.RESULT_DEDUP_PERSIST_INTERVAL,
+)
+
+
+@atexit.register
+def persist_result_filters():
+    try:
+        result_filters.flush()
+    except Exception as err:
+        print(f'{result_filters.thread_name} flush failed: {err}')
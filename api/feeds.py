@@ -0,0 +1,261 @@
+'''
+Materialized home feeds.
+
+A new card is pushed to the feed of every subscriber of its category, so the
+home page reads one user's feed instead of joining through all of their
+subscriptions. Feeds hold the newest HOME_FEED_LENGTH cards, and
+HOME_FEED_BACKEND picks where they live.
+
+The home page merges that feed with the cards of followed authors, see
+home_streams.
+'''
+
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from django.conf import settings
+from django.db import connection
+from django.db.models import IntegerField, QuerySet, Value
+from django.db.transaction import on_commit
+from django.utils.module_loading import import_string
+from .filters import after_position
+from .models import BingoCard, FeedEntry, SiteUser, Subscription
+
+Position = Optional[Tuple[datetime, int]]  # (created_at, card id) of the last card read
+
+
+class FeedStore:
+    '''The operations every feed backend provides.'''
+
+    def __init__(self, length: int):
+        self.length = length
+
+    def card_ids(self, user_id: int):
+        '''Ids of the newest cards in the user's feed, usable in an `id__in` filter.'''
+        raise NotImplementedError
+
+    def stream(self, user_id: int, position: Position, limit: int) -> List[Tuple[datetime, int]]:
+        '''The next `limit` (created_at, card id) of the user's feed after `position`, newest first.'''
+        raise NotImplementedError
+
+    def push(self, card: BingoCard):
+        '''Adds a new card to the feeds of its category's subscribers.'''
+        raise NotImplementedError
+
+    def remove(self, card: BingoCard):
+        raise NotImplementedError
+
+    def subscribe(self, user_id: int, category_id: int):
+        '''Backfills the newest cards of a category the user just subscribed to.'''
+        raise NotImplementedError
+
+    def unsubscribe(self, user_id: int, category_id: int):
+        raise NotImplementedError
+
+    def trim(self) -> int:
+        '''Drops entries past the feed length. Returns how many were dropped.'''
+        return 0
+
+
+class DatabaseFeedStore(FeedStore):
+    '''Keeps feeds in the FeedEntry table, trimmed by trim_home_feeds.'''
+
+    def card_ids(self, user_id: int):
+        return (FeedEntry.objects
+                .filter(user_id=user_id)
+                .order_by('-created_at', '-card_id')
+                .values('card_id')[:self.length])
+
+    def stream(self, user_id: int, position: Position, limit: int):
+        entries = FeedEntry.objects.filter(user_id=user_id).order_by('-created_at', '-card_id')
+        if position:
+            entries = after_position(entries, '-created_at', *position, id_column='card_id')
+        return list(entries.values_list('created_at', 'card_id')[:limit])
+
+    def push(self, card: BingoCard):
+        # one statement however many subscribers there are
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                INSERT INTO {FeedEntry._meta.db_table} (user_id, card_id, category_id, created_at)
+                SELECT user_id, %s, category_id, %s
+                FROM {Subscription._meta.db_table}
+                WHERE category_id = %s
+            ''', [card.id, card.created_at, card.category_id])
+
+    def remove(self, card: BingoCard):
+        pass  # entries are deleted with the card
+
+    def subscribe(self, user_id: int, category_id: int):
+        cards = (BingoCard.objects
+                 .filter(category_id=category_id)
+                 .order_by('-created_at', '-id')
+                 .values_list('id', 'created_at')[:self.length])
+
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, card_id=card_id, category_id=category_id, created_at=created_at)
+            for card_id, created_at in cards
+        ], ignore_conflicts=True)
+
+    def unsubscribe(self, user_id: int, category_id: int):
+        FeedEntry.objects.filter(user_id=user_id, category_id=category_id).delete()
+
+    def trim(self) -> int:
+        table = FeedEntry._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                DELETE FROM {table} WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY user_id ORDER BY created_at DESC, card_id DESC
+                        ) AS position
+                        FROM {table}
+                    ) ranked
+                    WHERE position > %s
+                )
+            ''', [self.length])
+            return cursor.rowcount
+
+
+class LocalFeedStore(FeedStore):
+    '''
+    Keeps feeds in this worker's memory, a stand-in for a shared store like
+    Redis. A user's feed is loaded from their subscriptions on first read and
+    dropped when they subscribe or unsubscribe, so it is only ever as stale as
+    the pushes other workers didn't send here. Changes wait for the
+    transaction that made them to commit, like the typeahead indexes.
+    '''
+
+    def __init__(self, length: int):
+        super().__init__(length)
+        # user id -> (-created timestamp, -card id, created_at) newest first
+        self._feeds: Dict[int, List[Tuple[float, int, datetime]]] = {}
+        # category id -> loaded users subscribed to it
+        self._subscribers: Dict[int, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def card_ids(self, user_id: int):
+        return [-card_id for _, card_id, _ in self._feed(user_id)]
+
+    def stream(self, user_id: int, position: Position, limit: int):
+        feed = self._feed(user_id)
+        start = 0
+        if position:
+            created_at, card_id = position
+            # first entry past (created_at, card_id), ids are whole numbers
+            start = bisect_left(feed, (-created_at.timestamp(), -card_id + 1))
+        return [(created_at, -card_id) for _, card_id, created_at in feed[start:start + limit]]
+
+    def push(self, card: BingoCard):
+        entry = (-card.created_at.timestamp(), -card.id, card.created_at)
+        on_commit(lambda: self._push(card.category_id, entry))
+
+    def remove(self, card: BingoCard):
+        # a deleted card's id is gone by the time the transaction commits
+        entry = (-card.created_at.timestamp(), -card.id, card.created_at)
+        on_commit(lambda: self._remove(card.category_id, entry))
+
+    def subscribe(self, user_id: int, category_id: int):
+        on_commit(lambda: self._forget(user_id))
+
+    def unsubscribe(self, user_id: int, category_id: int):
+        on_commit(lambda: self._forget(user_id))
+
+    def _push(self, category_id: int, entry: Tuple[float, int, datetime]):
+        with self._lock:
+            for user_id in self._subscribers.get(category_id, ()):
+                feed = self._feeds[user_id]
+                insort(feed, entry)
+                del feed[self.length:]
+
+    def _remove(self, category_id: int, entry: Tuple[float, int, datetime]):
+        with self._lock:
+            for user_id in self._subscribers.get(category_id, ()):
+                feed = self._feeds[user_id]
+                if entry in feed:
+                    feed.remove(entry)
+
+    def _feed(self, user_id: int) -> List[Tuple[float, int, datetime]]:
+        with self._lock:
+            feed = self._feeds.get(user_id)
+        return self._load(user_id) if feed is None else list(feed)
+
+    def _load(self, user_id: int) -> List[Tuple[float, int, datetime]]:
+        categories = set(Subscription.objects
+                         .filter(user_id=user_id)
+                         .values_list('category_id', flat=True))
+        cards = (BingoCard.objects
+                 .filter(category_id__in=categories)
+                 .order_by('-created_at', '-id')
+                 .values_list('created_at', 'id')[:self.length])
+        feed = [(-created_at.timestamp(), -card_id, created_at) for created_at, card_id in cards]
+
+        with self._lock:
+            self._feeds[user_id] = feed
+            for category_id in categories:
+                self._subscribers.setdefault(category_id, set()).add(user_id)
+        return feed
+
+    def _forget(self, user_id: int):
+        with self._lock:
+            if self._feeds.pop(user_id, None) is None:
+                return
+            for users in self._subscribers.values():
+                users.discard(user_id)
+
+
+def home_streams(user_id: int, ordering: str, position, limit: int) -> List[list]:
+    '''
+    The user's home feed as separately sorted streams for MergedPagination:
+    one for their subscriptions, read from their materialized feed, and one
+    per author they follow.
+    '''
+
+    # SiteUser.followers is stored followee -> follower, so these are the
+    # authors that user_id follows
+    followees = SiteUser.objects.filter(followers=user_id).values_list('id', flat=True)
+    sources = [BingoCard.objects.filter(author_id=author_id) for author_id in followees]
+
+    streams = []
+    if ordering == '-created_at':
+        streams.append(feed_store.stream(user_id, position, limit))
+    else:
+        # the feed only stores creation times, sort its cards by the others
+        sources.append(BingoCard.objects.filter(id__in=feed_store.card_ids(user_id)))
+
+    return streams + fetch_streams([
+        card_stream(cards, ordering, position, limit, tag=i)
+        for i, cards in enumerate(sources)
+    ])
+
+
+def card_stream(cards: QuerySet, ordering: str, position, limit: int, tag: int = 0) -> QuerySet:
+    '''(sort value, id, tag) of the next `limit` cards after `position`.'''
+
+    cards = cards.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+    if position:
+        cards = after_position(cards, ordering, *position)
+    return cards.annotate(tag=Value(tag, IntegerField())).values_list(ordering.lstrip('-'), 'id', 'tag')[:limit]
+
+
+def fetch_streams(streams: List[QuerySet]) -> List[list]:
+    '''
+    Evaluates card_stream querysets, in a single UNION ALL where the database
+    keeps each part's ORDER BY and LIMIT. Rows come back as (sort value, id).
+    '''
+
+    if len(streams) > 1 and connection.features.supports_slicing_ordering_in_compound:
+        rows = streams[0].union(*streams[1:], all=True)
+    else:
+        rows = [row for stream in streams for row in stream]
+
+    # a union doesn't keep the order inside each part
+    by_tag = [[] for _ in streams]
+    for value, card_id, tag in rows:
+        by_tag[tag].append((value, card_id))
+    for stream, queryset in zip(by_tag, streams):
+        stream.sort(reverse=queryset.query.order_by[0].startswith('-'))
+    return by_tag
+
+
+feed_store: FeedStore = import_string(settings.HOME_FEED_BACKEND)(settings.HOME_FEED_LENGTH)
@@ -1,22 +1,393 @@
-from datetime import timedelta, datetime
-from django.db.models import QuerySet, Count
+import base64
+import binascii
+import hashlib
+import heapq
+import json
+import time
+from datetime import timedelta
+from functools import partial
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connection
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import ExpressionWrapper, F, FloatField, QuerySet, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework import filters #, mixins
+from rest_framework.exceptions import NotFound
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.request import Request
 from rest_framework.response import Response
+from .hashtags import hashtag_cache
+from .models import Leaderboard
+
+
+class ExactCount:
+    '''COUNT(*) over the filtered queryset on every request.'''
+
+    def count(self, queryset: QuerySet) -> int:
+        return queryset.count()
+
+
+class CachedCount(ExactCount):
+    '''
+    Exact count, cached per filter combination for `ttl` seconds. The key is
+    the filtered query itself, so any filter that changes the SQL (including
+    per-user ones) gets its own entry.
+    '''
+
+    def __init__(self, ttl: int = 30):
+        self.ttl = ttl
+
+    def count(self, queryset: QuerySet) -> int:
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'count:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        return cache.get_or_set(key, queryset.count, self.ttl)
+
+
+class EstimatedCount(ExactCount):
+    '''
+    Planner row estimate when the queryset isn't filtered, exact count
+    otherwise. Only postgres keeps an estimate, other databases always count.
+    '''
+
+    def count(self, queryset: QuerySet) -> int:
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            # reltuples is -1 until the table has been analyzed
+            if row and row[0] >= 0:
+                return int(row[0])
+
+        return super().count(queryset)
+
+
+class HasMore:
+    '''No count at all, pages only say whether there's another one.'''
+
+
+class CountPaginator(Paginator):
+    '''
+    Paginator that gets its count from a count strategy. That count may be
+    cached or estimated, so pages are sliced and bounds checked against the
+    rows that actually come back instead of against the count.
+    '''
+
+    def __init__(self, *args, count_func=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        return self.count_func(self.object_list)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        page = self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+        if number > 1 and not page.object_list:
+            raise EmptyPage('That page contains no results')
+
+        return page
 
 
 class Pagination(PageNumberPagination):
+    '''
+    Page number pagination. Views pick how the total is worked out with a
+    `count_strategy` attribute, exact counts are the default. The time spent
+    counting is sent back in a Server-Timing header.
+    '''
+
     page_size = 10
+    count_strategy = ExactCount()
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None):
+        self.strategy = getattr(view, 'count_strategy', self.count_strategy)
+        self.count_time = 0.0
+
+        if isinstance(self.strategy, HasMore):
+            return self.paginate_has_more(queryset, request)
+
+        self.django_paginator_class = partial(CountPaginator, count_func=self.timed_count)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_has_more(self, queryset: QuerySet, request: Request):
+        self.request = request
+        offset = (self.requested_page(request) - 1) * self.page_size
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+
+        return results[:self.page_size]
+
+    def requested_page(self, request: Request) -> int:
+        try:
+            page_number = int(request.query_params.get(self.page_query_param, 1))
+            if page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        return page_number
+
+    def timed_count(self, queryset: QuerySet) -> int:
+        start = time.perf_counter()
+        count = self.strategy.count(queryset)
+        self.count_time = time.perf_counter() - start
+        return count
+
+    def get_paginated_response(self, data):
+        if isinstance(self.strategy, HasMore):
+            body = {'has_more': self.has_more}
+        else:
+            body = {'count': self.page.paginator.count}
+
+        return Response({
+            **body,
+            'page_size': self.page_size,
+            'results': data,
+        }, headers={'Server-Timing': f'count;dur={self.count_time * 1000:.2f}'})
+
+
+def after_position(queryset: QuerySet, ordering: str, value, last_id: int, id_column: str = 'id') -> QuerySet:
+    '''Rows that come after (value, last_id) in `ordering`, ties broken on id.'''
+    column = ordering.lstrip('-')
+    op = 'lt' if ordering.startswith('-') else 'gt'
+    # the first filter gives the planner an index range to scan,
+    # the second one breaks ties on id
+    return queryset.filter(**{f'{column}__{op}e': value}).filter(
+        Q(**{f'{column}__{op}': value}) | Q(**{column: value, f'{id_column}__{op}': last_id})
+    )
+
+
+class KeysetPagination(Pagination):
+    '''
+    Page number pagination, or keyset pagination when the request has a
+    `cursor` param (empty for the first page). Keyset pages are keyed on
+    (sort column, id), so a deep page costs the same as the first one.
+    '''
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        ordering = (queryset.query.order_by or queryset.model._meta.ordering)[0]
+        column = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        # annotations like search relevance have no model field
+        field = None if column in queryset.query.annotations else queryset.model._meta.get_field(column)
+
+        queryset = queryset.order_by(ordering, '-id' if descending else 'id')
+
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            queryset = after_position(queryset, ordering, *self.decode_cursor(cursor, ordering, field))
+
+        results = list(queryset[:self.page_size + 1])
+        page = results[:self.page_size]
+
+        self.next_cursor = None
+        if len(results) > self.page_size:
+            self.next_cursor = self.encode_cursor(page[-1], ordering, field)
+
+        return page
 
     def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
         return Response({
-            'count': self.page.paginator.count,
+            'next': self.next_cursor,
             'page_size': self.page_size,
             'results': data,
         })
 
+    def encode_cursor(self, obj, ordering: str, field) -> str:
+        if isinstance(obj, dict):
+            # a values() row
+            obj = SimpleNamespace(**obj)
+        value = field.value_to_string(obj) if field else getattr(obj, ordering.lstrip('-'))
+        position = [ordering, value, obj.id]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor: str, ordering: str, field):
+        try:
+            cursor_ordering, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if cursor_ordering != ordering:
+                raise ValueError
+            return (field.to_python(value) if field else float(value)), int(last_id)
+        except (binascii.Error, ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+def row_id(row) -> int:
+    '''Id of a model instance or a values() row.'''
+    return row['id'] if isinstance(row, dict) else row.id
+
+
+def merge_streams(streams, descending: bool, limit: int) -> list:
+    '''
+    K-way merge of (sort value, id) lists that are each sorted in the same
+    order. Returns the first `limit` distinct ids.
+    '''
+
+    ids = []
+    seen = set()
+    for _, row_id in heapq.merge(*streams, reverse=descending):
+        if row_id in seen:
+            continue
+        seen.add(row_id)
+        ids.append(row_id)
+        if len(ids) == limit:
+            break
+    return ids
+
+
+class MergedPagination(KeysetPagination):
+    '''
+    KeysetPagination for views that read their results from several sources,
+    each of which can be listed in sort order. The view's
+    `get_streams(ordering, position, limit)` returns the next `limit`
+    (sort value, id) pairs after `position` from every source, and pages are
+    merged from those, so a page costs about the page size per source however
+    many rows the queryset matches. The queryset is still what gets counted
+    and what the page's rows are loaded from.
+    '''
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None):
+        self.request = request
+        self.keyset = self.cursor_query_param in request.query_params
+        self.strategy = getattr(view, 'count_strategy', self.count_strategy)
+        self.count_time = 0.0
+
+        ordering = (queryset.query.order_by or queryset.model._meta.ordering)[0]
+        field = queryset.model._meta.get_field(ordering.lstrip('-'))
+
+        position = None
+        offset = 0
+        if self.keyset:
+            cursor = request.query_params[self.cursor_query_param]
+            if cursor:
+                position = self.decode_cursor(cursor, ordering, field)
+        else:
+            offset = (self.requested_page(request) - 1) * self.page_size
+
+        # one row past the page tells whether there's another
+        limit = offset + self.page_size + 1
+        ids = merge_streams(view.get_streams(ordering, position, limit), ordering.startswith('-'), limit)
+        page_ids = ids[offset:offset + self.page_size]
+        if offset and not page_ids:
+            raise NotFound(self.invalid_page_message)
+
+        rows = {row_id(row): row for row in queryset.filter(id__in=page_ids)}
+        page = [rows[i] for i in page_ids if i in rows]
+
+        self.has_more = len(ids) > offset + self.page_size
+        self.next_cursor = None
+        if self.has_more and page:
+            self.next_cursor = self.encode_cursor(page[-1], ordering, field)
+
+        if not self.keyset and not isinstance(self.strategy, HasMore):
+            self.count = self.timed_count(queryset)
+
+        return page
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return super().get_paginated_response(data)
+
+        if isinstance(self.strategy, HasMore):
+            body = {'has_more': self.has_more}
+        else:
+            body = {'count': self.count}
+
+        return Response({
+            **body,
+            'page_size': self.page_size,
+            'results': data,
+        }, headers={'Server-Timing': f'count;dur={self.count_time * 1000:.2f}'})
+
+
+class CardSearchFilter(SearchFilter):
+    '''
+    Postgres full-text search over `search_fields`, hashtags included since
+    they're part of the card name. Matches get a `relevance` annotation that
+    blends text rank with `best`, usable as an ordering. Other databases
+    fall back to SearchFilter's icontains matching, with relevance = best.
+    '''
+
+    search_config = 'english'
+    best_weight = 0.1
+
+    def filter_queryset(self, request: Request, cards: QuerySet, view):
+        terms = ' '.join(self.get_search_terms(request))
+
+        if not terms or connection.vendor != 'postgresql':
+            cards = super().filter_queryset(request, cards, view)
+            if terms or 'relevance' in request.query_params.get('ordering', ''):
+                cards = cards.annotate(relevance=F('best'))
+            return cards
+
+        # same expression as the GIN index on card names, so it gets used
+        vector = SearchVector(*self.get_search_fields(view, request), config=self.search_config)
+        query = SearchQuery(terms, config=self.search_config, search_type='websearch')
+
+        return (cards
+                .annotate(search=vector)
+                .filter(search=query)
+                .annotate(relevance=ExpressionWrapper(
+                    SearchRank(vector, query) + self.best_weight * F('best'),
+                    output_field=FloatField())))
+
+
+class CardOrderingFilter(OrderingFilter):
+    '''Orders searches by relevance unless an `ordering` is asked for.'''
+
+    def get_default_ordering(self, view):
+        if CardSearchFilter().get_search_terms(view.request):
+            return ['-relevance']
+        return super().get_default_ordering(view)
+
+
+class CategorySearchFilter(SearchFilter):
+    '''
+    Fuzzy category name matching on postgres. Both the substring and the
+    trigram match are served by the pg_trgm index on category names. Other
+    databases fall back to SearchFilter's icontains matching.
+    '''
+
+    def filter_queryset(self, request: Request, categories: QuerySet, view):
+        terms = ' '.join(self.get_search_terms(request))
+
+        if not terms or connection.vendor != 'postgresql':
+            return super().filter_queryset(request, categories, view)
+
+        matches = Q()
+        for field in self.get_search_fields(view, request):
+            matches |= Q(**{f'{field}__icontains': terms}) | Q(**{f'{field}__trigram_similar': terms})
+
+        return categories.filter(matches)
+
 
 class CardCategoryFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request: Request, cards: QuerySet, _):
@@ -33,10 +404,8 @@ class CardHashtagFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request: Request, cards: QuerySet, _):
         hashtag = request.query_params.get('hashtag')
         if hashtag:
-            try:
-                cards = cards.filter(hashtags__name__iexact=hashtag)
-            except Exception as err:
-                print(err)
+            hashtag_id = hashtag_cache.get(hashtag)
+            cards = cards.filter(hashtags=hashtag_id) if hashtag_id else cards.none()
         return cards
 
 
@@ -64,7 +433,9 @@ class DateFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request: Request, cards: QuerySet, _):
         interval = date_deltas.get(request.query_params.get('from'))
         if interval:
-            some_time_ago = datetime.today() - timedelta(**interval)
+            # whole minutes, so the query (and CachedCount's key) stays the
+            # same for a minute
+            some_time_ago = (timezone.now() - timedelta(**interval)).replace(second=0, microsecond=0)
             try:
                 cards = cards.filter(created_at__gte=some_time_ago)
             except Exception as err:
@@ -72,19 +443,66 @@ class DateFilter(filters.BaseFilterBackend):
         return cards
 
 
+# card orderings that have leaderboards, see refresh_leaderboards
+leaderboard_orderings = ['best', 'score']
+
+
+class LeaderboardFilter(DateFilter):
+    '''
+    DateFilter that also narrows `from` listings sorted by -best or -score
+    down to the matching leaderboard, so only that board's cards get sorted
+    instead of every card in the window. Pages end after LEADERBOARD_SIZE
+    cards. Requests with other filters, or whose board is older than
+    LEADERBOARD_MAX_AGE seconds, get the live query.
+    '''
+
+    live_params = ['search', 'user', 'hashtag']
+
+    def filter_queryset(self, request: Request, cards: QuerySet, view):
+        # the cutoff still applies, so cards drop out of the window on time
+        cards = super().filter_queryset(request, cards, view)
+
+        board_id = self.leaderboard_id(request)
+        if board_id is not None:
+            cards = cards.filter(leaderboards=board_id)
+        return cards
+
+    def leaderboard_id(self, request: Request):
+        params = request.query_params
+        window = params.get('from')
+        ordering = params.get('ordering', '')
+
+        if (window not in date_deltas
+                or ordering.lstrip('-') not in leaderboard_orderings
+                or not ordering.startswith('-')
+                or any(params.get(p) for p in self.live_params)):
+            return None
+
+        category = params.get('category')
+        boards = Leaderboard.objects.filter(
+            window=window,
+            ordering=ordering.lstrip('-'),
+            refreshed_at__gte=timezone.now() - timedelta(seconds=settings.LEADERBOARD_MAX_AGE),
+        )
+        boards = boards.filter(category__name__iexact=category) if category else boards.filter(category=None)
+
+        return boards.values_list('id', flat=True).first()
+
+
 class TopThreeCategoryFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request: Request, queryset: QuerySet, _):
-        return queryset.annotate(card_count=Count('cards')).order_by('-card_count')[:3]
+        return queryset.order_by('-card_count')[:3]
 
 
 def top_n_categories(n: int):
     class Wrapper(filters.BaseFilterBackend):
         def filter_queryset(self, request: Request, queryset: QuerySet, _):
-            return queryset.annotate(sub_count=Count('subscribers')).order_by('-sub_count')[:n]
+            return queryset.order_by('-subscriber_count')[:n]
 
     return Wrapper
 
 
 class TopThreeCardFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request: Request, queryset: QuerySet, _):
-        return queryset.order_by('-best')[:3]
+        ordering = '-relevance' if 'relevance' in queryset.query.annotations else '-best'
+        return queryset.order_by(ordering)[:3]
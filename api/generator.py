@@ -0,0 +1,166 @@
+'''
+Random cards drawn from a category's tile pool, for the lobby game mode.
+
+Every tile of every card in a category goes into its pool, minus repeated
+texts. Each worker keeps the pools it has used as flat arrays of tile ids and
+cumulative weights, so a card is 25 weighted draws without replacement and
+no queries. A tile's weight is 1 + its score.
+
+A pool's version covers its tiles but not their weights, so scores can be
+refreshed while cards are being played, and results name the tiles they
+were played with. Generated cards are signed over their category, seed,
+version and tiles, so a result can only name what it was dealt. The same seed gives the same card until the tiles or
+their scores change. Pools are dropped when this worker sees the category's
+tiles change, and reloaded after CARD_GENERATOR_POOL_TTL seconds in any case
+to pick up other workers' edits.
+'''
+
+import heapq
+import random
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+from .models import BingoCardCategory, BingoTile
+
+CARD_TILES = 25
+MAX_SEED = 2 ** 32 - 1
+
+
+class TilePool:
+    def __init__(self, category_id: int, category_name: str, tiles: List[Tuple[int, str, float]]):
+        self.category_id = category_id
+        self.category_name = category_name
+        self.loaded_at = time.monotonic()
+
+        seen = set()
+        ids, texts, weights = array('q'), [], array('d')
+        for tile_id, text, score in tiles:
+            key = text.strip().lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            ids.append(tile_id)
+            texts.append(text)
+            weights.append(1 + max(score, 0))
+
+        self.ids = ids
+        self.texts = tuple(texts)
+        self.weights = weights
+        self.cumulative = array('d')
+        total = 0.0
+        for weight in weights:
+            total += weight
+            self.cumulative.append(total)
+
+        self.version = zlib.crc32('\0'.join(texts).encode(), zlib.crc32(ids.tobytes()))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sample(self, seed: int, k: int = CARD_TILES) -> List[int]:
+        '''Positions of `k` different tiles, drawn by weight.'''
+
+        rng = random.Random(seed)
+        n = len(self.ids)
+        if n < 2 * k:
+            return self._sample_by_keys(rng, k)
+
+        # with a big pool, repeats are rare enough to redraw
+        total = self.cumulative[-1]
+        chosen = {}
+        for _ in range(20 * k):
+            chosen.setdefault(min(bisect_right(self.cumulative, rng.random() * total), n - 1))
+            if len(chosen) == k:
+                return list(chosen)
+
+        return self._sample_by_keys(rng, k)
+
+    def _sample_by_keys(self, rng: random.Random, k: int) -> List[int]:
+        # Efraimidis-Spirakis: the k largest random() ** (1 / weight)
+        keys = [rng.random() ** (1 / weight) for weight in self.weights]
+        return heapq.nlargest(k, range(len(keys)), key=keys.__getitem__)
+
+
+def card_signature(category_id: int, seed: int, version: int, tile_ids: List[int]) -> str:
+    value = f'{category_id}:{seed}:{version}:{",".join(map(str, tile_ids))}'
+    return signing.Signer(salt='api.generator.card').signature(value)
+
+
+def check_card_signature(signature: str, category_id: int, seed: int, version: int, tile_ids: List[int]) -> bool:
+    '''Whether the card was generated here with exactly these tiles.'''
+    return constant_time_compare(signature, card_signature(category_id, seed, version, tile_ids))
+
+
+class CardGenerator:
+    def __init__(self, pool_ttl: float):
+        self.pool_ttl = pool_ttl
+        self._pools: Dict[str, TilePool] = {}
+        self._lock = threading.Lock()
+
+    def generate(self, category_name: str, seed: Optional[int] = None) -> Optional[dict]:
+        '''
+        A card from the category's pool, or None when there's no such
+        category. Raises ValueError when the pool has under 25 tiles.
+        '''
+
+        pool = self.pool(category_name)
+        if pool is None:
+            return None
+        if len(pool) < CARD_TILES:
+            raise ValueError(f'{pool.category_name} has {len(pool)} different tiles, {CARD_TILES} are needed.')
+
+        if seed is None:
+            seed = random.randint(0, MAX_SEED)
+        tiles = [{'id': pool.ids[i], 'text': pool.texts[i]} for i in pool.sample(seed)]
+        return {
+            'category': pool.category_name,
+            'seed': seed,
+            'version': pool.version,
+            'tiles': tiles,
+            'signature': card_signature(pool.category_id, seed, pool.version, [tile['id'] for tile in tiles]),
+        }
+
+    def pool(self, category_name: str) -> Optional[TilePool]:
+        key = category_name.lower()
+        pool = self._pools.get(key)
+        if pool is not None and time.monotonic() - pool.loaded_at < self.pool_ttl:
+            return pool
+
+        pool = load_pool(category_name)
+        with self._lock:
+            if pool is None:
+                self._pools.pop(key, None)
+            else:
+                self._pools[key] = pool
+        return pool
+
+    def invalidate(self, category_id: int):
+        with self._lock:
+            for key, pool in list(self._pools.items()):
+                if pool.category_id == category_id:
+                    del self._pools[key]
+
+
+def load_pool(category_name: str) -> Optional[TilePool]:
+    category = (BingoCardCategory.objects
+                .filter(name__iexact=category_name)
+                .values_list('id', 'name')
+                .first())
+    if category is None:
+        return None
+
+    category_id, name = category
+    tiles = (BingoTile.objects
+             .filter(card__category_id=category_id)
+             .order_by('id')
+             .values_list('id', 'text', 'score'))
+    return TilePool(category_id, name, list(tiles))
+
+
+card_generator = CardGenerator(settings.CARD_GENERATOR_POOL_TTL)
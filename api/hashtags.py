@@ -0,0 +1,179 @@
+'''
+Hashtag name -> id resolution.
+
+There are few hashtags and they almost never change, so each worker keeps
+the ids of the ones it has seen in an LRU cache of HASHTAG_CACHE_SIZE names,
+filled with the most used hashtags on first use (HASHTAG_CACHE_SIZE = 0
+turns it off). Card creation and the
+hashtag filter resolve names through it without reading the Hashtag table,
+unless a name is new to this worker.
+
+Hashtags are only ever created, not renamed. A deleted hashtag is dropped
+from the cache of the worker that deleted it, other workers keep its id
+until it's evicted or a card is tagged with it, see link_card_hashtags.
+'''
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.db.transaction import on_commit
+from .models import Hashtag
+
+
+def normalize(name: str) -> str:
+    '''Hashtags are stored lowercase.'''
+    return name.lower()
+
+
+def hashtag_names(text: str) -> List[str]:
+    '''The first 4 hashtags in `text`, the ones cards are tagged with.'''
+    return list(dict.fromkeys(
+        normalize(h)
+        for h in re.findall(r'#(\w+)', text)[:4]
+        if len(h) <= 20
+    ))
+
+
+class HashtagCache:
+    def __init__(self, size: int):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._ids: 'OrderedDict[str, int]' = OrderedDict()
+        self._warm = False
+        self._lock = threading.Lock()
+
+    def get_or_create(self, names: Iterable[str]) -> Dict[str, int]:
+        '''Ids of the hashtags called `names`, creating the missing ones.'''
+
+        names = list(dict.fromkeys(normalize(name) for name in names))
+        ids = self._cached(names)
+
+        missing = [name for name in names if name not in ids]
+        if missing:
+            created = dict(upsert_hashtags(missing))
+            # a rolled back card would leave ids of hashtags that don't exist
+            on_commit(lambda: self._store(created.items()))
+            ids.update(created)
+
+        return ids
+
+    def get(self, name: str) -> Optional[int]:
+        '''Id of an existing hashtag, or None when there's no such hashtag.'''
+
+        name = normalize(name)
+        hashtag_id = self._cached([name]).get(name)
+        if hashtag_id is None:
+            hashtag_id = Hashtag.objects.filter(name__iexact=name).values_list('id', flat=True).first()
+            if hashtag_id is not None:
+                self._store([(name, hashtag_id)])
+
+        return hashtag_id
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        '''The names that would have to be read from the database.'''
+        self._ensure_warm()
+        with self._lock:
+            return [name for name in dict.fromkeys(map(normalize, names)) if name not in self._ids]
+
+    def discard(self, name: str):
+        with self._lock:
+            self._ids.pop(normalize(name), None)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._warm = False
+
+    def _cached(self, names: List[str]) -> Dict[str, int]:
+        self._ensure_warm()
+
+        found = {}
+        with self._lock:
+            for name in names:
+                hashtag_id = self._ids.get(name)
+                if hashtag_id is not None:
+                    self._ids.move_to_end(name)
+                    found[name] = hashtag_id
+
+            self.hits += len(found)
+            self.misses += len(names) - len(found)
+        return found
+
+    def _store(self, pairs: Iterable[Tuple[str, int]]):
+        with self._lock:
+            for name, hashtag_id in pairs:
+                self._ids[name] = hashtag_id
+                self._ids.move_to_end(name)
+            while len(self._ids) > self.size:
+                self._ids.popitem(last=False)
+
+    def _ensure_warm(self):
+        if self._warm:
+            return
+
+        # the most used hashtags first, so they end up the most recent
+        popular = (Hashtag.objects
+                   .annotate(card_total=Count('cards'))
+                   .order_by('-card_total', 'id')
+                   .values_list('name', 'id')[:self.size])
+        pairs = list(popular)
+
+        with self._lock:
+            if not self._warm:
+                for name, hashtag_id in reversed(pairs):
+                    self._ids.setdefault(name, hashtag_id)
+                self._warm = True
+
+
+def upsert_hashtags(names: List[str]) -> List[Tuple[str, int]]:
+    '''(name, id) of the hashtags called `names`, created if they're missing.'''
+
+    if connection.vendor == 'postgresql' or (
+            connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)):
+        # one round trip, the no-op update is what makes existing rows come back
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                INSERT INTO {Hashtag._meta.db_table} (name)
+                VALUES {', '.join(['(%s)'] * len(names))}
+                ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+                RETURNING name, id
+            ''', names)
+            return cursor.fetchall()
+
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    return list(Hashtag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def link_card_hashtags(card_id: int, hashtag_ids: Iterable[int]) -> int:
+    '''
+    Tags the card with the hashtags of `hashtag_ids` that still exist,
+    returns how many those were. Ids of deleted hashtags are skipped instead
+    of failing the foreign key, which Postgres would only check on commit.
+    '''
+
+    hashtag_ids = list(hashtag_ids)
+    CardHashtag = Hashtag.cards.through
+    if connection.vendor in ('postgresql', 'sqlite'):
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                INSERT INTO {CardHashtag._meta.db_table} (hashtag_id, bingocard_id)
+                SELECT id, %s FROM {Hashtag._meta.db_table}
+                WHERE id IN ({', '.join(['%s'] * len(hashtag_ids))})
+                ON CONFLICT DO NOTHING
+            ''', [card_id, *hashtag_ids])
+            return cursor.rowcount
+
+    existing = list(Hashtag.objects.filter(id__in=hashtag_ids).values_list('id', flat=True))
+    CardHashtag.objects.bulk_create([
+        CardHashtag(hashtag_id=hashtag_id, bingocard_id=card_id)
+        for hashtag_id in existing
+    ], ignore_conflicts=True)
+    return len(existing)
+
+
+hashtag_cache = HashtagCache(settings.HASHTAG_CACHE_SIZE)
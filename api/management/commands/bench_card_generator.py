@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.transaction import atomic
+from api.generator import CARD_TILES, load_pool
+from api.testing import create_pool, site_user
+
+
+class Command(BaseCommand):
+    help = ('Measures how many cards per second the generator draws from tile pools of a few sizes, '
+            'and checks that seeds give the same card every time. Changes are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with atomic():
+            author = site_user('bench_generator')
+            for cards in [2, 10, 100, 1000]:
+                category = create_pool(author, cards)
+                pool = load_pool(category.name)
+                self.measure(pool, options['cards'])
+            transaction.set_rollback(True)
+
+    def measure(self, pool, count: int):
+        start = time.perf_counter()
+        for seed in range(count):
+            positions = pool.sample(seed)
+            [(pool.ids[i], pool.texts[i]) for i in positions]
+        elapsed = time.perf_counter() - start
+
+        for seed in range(0, count, 97):
+            positions = pool.sample(seed)
+            if len(set(positions)) != CARD_TILES:
+                raise CommandError(f'seed {seed} repeated tiles')
+            if pool.sample(seed) != positions:
+                raise CommandError(f'seed {seed} gave a different card the second time')
+
+        self.stdout.write(f'{len(pool):7} tiles: {count / elapsed:9.0f} cards/s '
+                          f'({elapsed / count * 1e6:5.0f} us per card)')
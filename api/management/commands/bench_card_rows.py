@@ -0,0 +1,59 @@
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.transaction import atomic
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.testing import create_list_cards
+from api.serializers import CardListSerializer, CardRowSerializer
+from api.views import CARD_LIST_QUERYSET
+
+
+class Command(BaseCommand):
+    help = ('Compares time and peak memory of card list pages built by CardListSerializer from model '
+            'instances and by CardRowSerializer from values() rows. Changes are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with atomic():
+            create_list_cards(options['cards'])
+            repeat = options['repeat']
+
+            for size in [10, 100, 1000]:
+                cards = CARD_LIST_QUERYSET.order_by('-created_at')
+                model = self.measure(repeat, lambda: CardListSerializer(cards[:size], many=True).data)
+                rows = self.measure(repeat, lambda: CardRowSerializer(
+                    cards.prefetch_related(None).values(*CardRowSerializer.columns)[:size], many=True).data)
+                self.report(f'page of {size}', model, rows)
+
+            client = APIClient()
+            for url in ['/api/cards/?cursor=', '/api/cards/?page=5&ordering=-best']:
+                with override_settings(ROW_SERIALIZERS=False, RESPONSE_CACHE=False):
+                    model = self.measure(repeat, lambda: client.get(url))
+                with override_settings(ROW_SERIALIZERS=True, RESPONSE_CACHE=False):
+                    rows = self.measure(repeat, lambda: client.get(url))
+                self.report(url, model, rows)
+
+            transaction.set_rollback(True)
+
+    def measure(self, repeat: int, function):
+        '''Average seconds per call, and the peak bytes allocated by one call.'''
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        return (time.perf_counter() - start) / repeat, peak
+
+    def report(self, label: str, model, rows):
+        (model_time, model_peak), (rows_time, rows_peak) = model, rows
+        self.stdout.write(f'{label:>34}: model {model_time * 1000:7.2f} ms {model_peak / 1024:7.0f} KiB, '
+                          f'rows {rows_time * 1000:7.2f} ms {rows_peak / 1024:7.0f} KiB, '
+                          f'{model_time / rows_time:4.1f}x faster, {model_peak / rows_peak:4.1f}x less memory')
@@ -0,0 +1,50 @@
+import io
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.transaction import atomic
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from api import renderers
+from api.testing import create_list_cards, payloads
+from api.renderers import FastJSONParser, FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = ('Compares the stock and fast JSON renderers and parsers on card, category and user '
+            'pages. Changes are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write('orjson is not installed, the fast classes are the stock ones.')
+
+        with atomic():
+            create_list_cards(options['cards'])
+            pages = payloads()
+            transaction.set_rollback(True)
+
+        repeat = options['repeat']
+        for name, data in pages.items():
+            body = JSONRenderer().render(data)
+            stock = self.time(repeat, lambda: JSONRenderer().render(data))
+            fast = self.time(repeat, lambda: FastJSONRenderer().render(data))
+            self.report(f'render {name}', len(body), stock, fast)
+
+            stock = self.time(repeat, lambda: JSONParser().parse(io.BytesIO(body)))
+            fast = self.time(repeat, lambda: FastJSONParser().parse(io.BytesIO(body)))
+            self.report(f'parse {name}', len(body), stock, fast)
+
+    def time(self, repeat: int, function) -> float:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        return (time.perf_counter() - start) / repeat
+
+    def report(self, label: str, size: int, stock: float, fast: float):
+        self.stdout.write(f'{label:>24} ({size / 1024:6.1f} KiB): stock {stock * 1e6:8.0f} us '
+                          f'({size / stock / 2 ** 20:6.0f} MiB/s), fast {fast * 1e6:6.0f} us '
+                          f'({size / fast / 2 ** 20:6.0f} MiB/s), {stock / fast:5.1f}x')
@@ -0,0 +1,57 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.transaction import atomic
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.caching import cache_stats, response_cache
+from api.models import BingoCard, BingoCardCategory, SiteUser, Vote
+
+
+class Command(BaseCommand):
+    help = ('Replays a mix of anonymous reads and votes against the cached endpoints, '
+            'with and without the response cache. Changes are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--write-ratio', type=float, default=0.02,
+                            help='share of requests that are votes instead of reads')
+
+    def handle(self, *args, **options):
+        card_ids = list(BingoCard.objects.values_list('id', flat=True)[:200])
+        names = list(BingoCardCategory.objects.values_list('name', flat=True)[:50])
+        voters = list(SiteUser.objects.values_list('id', flat=True)[:50])
+        if not card_ids or not names or not voters:
+            self.stdout.write('Needs cards, categories and users, run init_db first.')
+            return
+
+        for enabled in [False, True]:
+            with override_settings(RESPONSE_CACHE=enabled), atomic():
+                response_cache.clear()
+                cache_stats.__init__()
+                elapsed = self.replay(card_ids, names, voters, options)
+                transaction.set_rollback(True)
+
+            label = 'cache' if enabled else 'no cache'
+            self.stdout.write(f'{label:>8}: {elapsed / options["requests"] * 1000:.2f} ms per request')
+            if enabled:
+                self.stdout.write(f'          {cache_stats.summary()}')
+
+    def replay(self, card_ids, names, voters, options) -> float:
+        rng = random.Random(0)
+        client = APIClient()
+        # a few popular urls get most of the traffic
+        urls = ([f'/api/cards/{i}/' for i in card_ids]
+                + [f'/api/categories/{n}/' for n in names]
+                + ['/api/cards/', '/api/cards/?ordering=-best&from=week', '/api/popular/categories/'])
+        weights = [1 / (rank + 1) for rank in range(len(urls))]
+
+        start = time.perf_counter()
+        for _ in range(options['requests']):
+            if rng.random() < options['write_ratio']:
+                Vote.objects.update_or_create(user_id=rng.choice(voters), card_id=rng.choice(card_ids),
+                                              defaults={'up': rng.random() < 0.7})
+            else:
+                client.get(rng.choices(urls, weights)[0])
+        return time.perf_counter() - start
@@ -0,0 +1,44 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.dedup import ResultFilters, result_key
+
+
+class Command(BaseCommand):
+    help = ('Measures first-result checks per second, the false positive rate of first results and '
+            'that repeats are always caught, on a full window of in-memory filters. Nothing is stored.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--capacity', type=int, default=settings.RESULT_DEDUP_CAPACITY)
+        parser.add_argument('--error-rate', type=float, default=settings.RESULT_DEDUP_ERROR_RATE)
+        parser.add_argument('--window', type=int, default=settings.RESULT_DEDUP_WINDOW)
+
+    def handle(self, *args, **options):
+        capacity = options['capacity']
+        filters = ResultFilters(capacity, options['error_rate'], bucket_seconds=3600, window=options['window'],
+                                interval=60, background=False)
+
+        # a full window of full buckets
+        now = time.time()
+        start = time.perf_counter()
+        for bucket in range(options['window']):
+            at = now - (options['window'] - 1 - bucket) * 3600
+            for i in range(capacity):
+                filters.first_seen(result_key(f'session:{bucket}', i, 1, None), at)
+        elapsed = time.perf_counter() - start
+
+        checks = capacity * options['window']
+        repeats = sum(not filters.first_seen(result_key(f'session:{b}', i, 1, None), now)
+                      for b in range(options['window']) for i in range(0, capacity, 97))
+        expected_repeats = options['window'] * len(range(0, capacity, 97))
+        if repeats != expected_repeats:
+            raise CommandError(f'{expected_repeats - repeats} repeats got through')
+
+        trials = capacity // 20  # few enough not to overfill the current filter
+        false_positives = sum(not filters.first_seen(result_key('new', i, 2, None), now) for i in range(trials))
+
+        memory = sum(len(f.bits) for f in filters._filters.values())
+        self.stdout.write(f'{checks / elapsed:,.0f} checks/sec ({elapsed / checks * 1e6:.1f} us per check) '
+                          f'with {len(filters._filters)} filters, {memory / 2 ** 20:.1f} MiB')
+        self.stdout.write(f'all {repeats} repeats caught, {false_positives / trials:.4%} of first results '
+                          f'turned away (configured {options["error_rate"]:.4%})')
@@ -0,0 +1,79 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.db.transaction import atomic
+from api.buffers import ResultBuffer, apply_results
+from api.generator import load_pool
+from api.models import BingoResult, TileCounter
+from api.testing import create_pool, site_user
+
+
+class Command(BaseCommand):
+    help = ('Compares results/sec of writing each generated card result on its own against the batched '
+            'result buffer, and checks the tile counters add up. Changes are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--results', type=int, default=2000)
+        parser.add_argument('--cards', type=int, default=4, help='Cards in the tile pool, 25 tiles each.')
+        parser.add_argument('--interval', type=int, default=100, help='Buffer flush interval in ms.')
+
+    def handle(self, *args, **options):
+        count = options['results']
+
+        with atomic():
+            category = create_pool(site_user('bench_results'), options['cards'])
+            pool = load_pool(category.name)
+            rng = random.Random(0)
+            results = [
+                (BingoResult(category_id=category.id, seed=seed, version=pool.version, mask=rng.getrandbits(25)),
+                 [pool.ids[i] for i in pool.sample(seed)])
+                for seed in range(count)
+            ]
+
+            start = time.perf_counter()
+            for result in results:
+                apply_results([result])
+            single_rate = count / (time.perf_counter() - start)
+
+            # flushed inline so everything stays inside this transaction
+            buffer = ResultBuffer(interval=options['interval'] / 1000, max_pending=count, background=False)
+            start = last_flush = time.perf_counter()
+            for result, tile_ids in results:
+                buffer.add(BingoResult(category_id=result.category_id, seed=result.seed,
+                                       version=result.version, mask=result.mask), tile_ids)
+                now = time.perf_counter()
+                if now - last_flush >= buffer.interval:
+                    buffer.flush()
+                    last_flush = now
+            buffer.flush()
+            buffer_rate = count / (time.perf_counter() - start)
+
+            self.check_counts(results, category.id)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'  one by one: {single_rate:,.0f} results/sec')
+        self.stdout.write(f'result buffer: {buffer_rate:,.0f} results/sec ({buffer_rate / single_rate:.1f}x)')
+
+    def check_counts(self, results, category_id: int):
+        '''Both passes wrote every result, so each count is twice what the results add up to.'''
+        expected = {}
+        for result, tile_ids in results:
+            for bit, tile_id in enumerate(tile_ids):
+                count = expected.setdefault(tile_id, [0, 0])
+                count[0] += 2 * (result.mask >> bit & 1)
+                count[1] += 2
+
+        stored = {
+            tile_id: [hits, exposures]
+            for tile_id, hits, exposures in TileCounter.objects
+            .filter(tile_id__in=expected)
+            .values('tile_id')
+            .annotate(hits=Sum('hits'), exposures=Sum('exposures'))
+            .values_list('tile_id', 'hits', 'exposures')
+        }
+        if stored != expected:
+            raise CommandError("tile counters don't match the results")
+        if BingoResult.objects.filter(category_id=category_id).count() != 2 * len(results):
+            raise CommandError('results are missing from the log')
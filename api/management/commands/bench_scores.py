@@ -0,0 +1,54 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from api import sorting
+
+
+class Command(BaseCommand):
+    help = 'Compares per-call, batched libreddit_sort and NumPy scoring throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        count = options['cards']
+        rng = np.random.default_rng(0)
+        totals = rng.integers(0, 5000, count).astype(np.float64)
+        ups = np.floor(totals * rng.random(count))
+        timestamps = 1.6e9 + rng.random(count) * 1e8
+
+        ups_list, totals_list, timestamps_list = ups.tolist(), totals.tolist(), timestamps.tolist()
+
+        def per_call():
+            return ([sorting.hot_score(*args) for args in zip(ups_list, totals_list, timestamps_list)],
+                    [sorting.best_score(*args) for args in zip(ups_list, totals_list)])
+
+        runs = [('per call', per_call)]
+
+        try:
+            from libreddit_sort import hot_scores, best_scores
+            runs.append(('batched rust', lambda: (
+                hot_scores(ups_list, totals_list, timestamps_list),
+                best_scores(ups_list, totals_list),
+            )))
+        except ImportError:
+            self.stdout.write('libreddit_sort.so with batch functions not found, skipping batched rust')
+
+        runs.append(('numpy', lambda: (
+            sorting.np_hot_scores(ups, totals, timestamps),
+            sorting.np_best_scores(ups, totals),
+        )))
+
+        expected = None
+        for name, run in runs:
+            start = time.perf_counter()
+            hot, best = run()
+            elapsed = time.perf_counter() - start
+
+            hot, best = np.asarray(hot), np.asarray(best)
+            if expected is None:
+                expected = hot, best
+            same = np.array_equal(hot, expected[0]) and np.array_equal(best, expected[1])
+
+            self.stdout.write(f'{name:>12}: {count / elapsed:>14,.0f} cards/sec'
+                              f'{"" if same else "  (OUTPUT DIFFERS)"}')
@@ -0,0 +1,82 @@
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.transaction import atomic
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.filters import CardSearchFilter
+from api.models import BingoCard, BingoCardCategory, SiteUser
+
+words = [
+    'anime', 'japan', 'food', 'monke', 'karen', 'grant', 'podcast', 'isekai', 'weeb', 'tournament',
+    'connor', 'garnt', 'joey', 'meme', 'simp', 'hentai', 'fate', 'jojo', 'school', 'days',
+    'guest', 'episode', 'story', 'time', 'brain', 'giga', 'tangent', 'source', 'material', 'attitude',
+]
+
+
+class SearchView:
+    search_fields = ['name']
+
+
+class Command(BaseCommand):
+    help = 'Compares icontains search with full-text search over generated cards. Changes are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('Not on postgres, both paths use icontains here.')
+
+        with atomic():
+            self.stdout.write(f'Creating {options["cards"]:,} cards...')
+            create_cards(options['cards'])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ANALYZE {BingoCard._meta.db_table}')
+
+            for term in ['anime', 'garnt story', 'tournament arc']:
+                request = Request(APIRequestFactory().get('/', {'search': term}))
+                old = self.time(options['repeat'], lambda: SearchFilter()
+                                .filter_queryset(request, BingoCard.objects.all(), SearchView)
+                                .order_by('-best'))
+                new = self.time(options['repeat'], lambda: CardSearchFilter()
+                                .filter_queryset(request, BingoCard.objects.all(), SearchView)
+                                .order_by('-relevance'))
+                self.stdout.write(f'{term!r:>16}: icontains {old * 1000:8.1f} ms, full text {new * 1000:8.1f} ms')
+
+            transaction.set_rollback(True)
+
+    def time(self, repeat: int, make_queryset) -> float:
+        '''Average time of a count plus the first page, like a list request.'''
+        start = time.perf_counter()
+        for _ in range(repeat):
+            queryset = make_queryset()
+            queryset.count()
+            list(queryset[:10])
+        return (time.perf_counter() - start) / repeat
+
+
+def create_cards(count: int, batch_size: int = 10_000):
+    auth_user = User.objects.create_user(username='bench_search', password=None)
+    author = SiteUser.objects.create(name=auth_user.username, auth_user=auth_user)
+    category = BingoCardCategory.objects.create(name='bench_search', author=author)
+
+    rng = random.Random(0)
+    for start in range(0, count, batch_size):
+        BingoCard.objects.bulk_create([
+            BingoCard(
+                name=' '.join(rng.sample(words, 4)) + ' #' + rng.choice(words),
+                author=author,
+                category=category,
+                best=rng.random(),
+                score=0,
+                ups=0,
+                votes_total=0,
+            )
+            for _ in range(min(batch_size, count - start))
+        ])
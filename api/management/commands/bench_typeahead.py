@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.transaction import atomic
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+from api.management.commands.bench_search import create_cards
+from api.typeahead import card_index, category_index, load_cards, load_categories
+from api.views import CardSearchList, CategorySearchList
+
+prefixes = ['a', 'an', 'ani', 'anime', 'garnt st', 'tourn', 'xyz']
+
+
+class Command(BaseCommand):
+    help = 'Compares search bar latency of the database path and the in-memory prefix index. Changes are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with atomic():
+            self.stdout.write(f'Creating {options["cards"]:,} cards...')
+            create_cards(options['cards'])
+
+            start = time.perf_counter()
+            card_index.build(load_cards())
+            category_index.build(load_categories())
+            self.stdout.write(f'Built indexes in {time.perf_counter() - start:.2f}s')
+
+            for label, view in [('cards', CardSearchList.as_view()), ('categories', CategorySearchList.as_view())]:
+                for prefix in prefixes:
+                    with override_settings(TYPEAHEAD_INDEX=False):
+                        db = self.time(view, prefix, options['repeat'])
+                    memory = self.time(view, prefix, options['repeat'])
+                    self.stdout.write(f'{label:>10} {prefix!r:>11}: database {db * 1e6:10.0f} us, '
+                                      f'index {memory * 1e6:8.0f} us')
+
+            transaction.set_rollback(True)
+
+    def time(self, view, prefix: str, repeat: int) -> float:
+        request = APIRequestFactory().get('/', {'search': prefix})
+        start = time.perf_counter()
+        for _ in range(repeat):
+            view(request).render()
+        return (time.perf_counter() - start) / repeat
@@ -0,0 +1,57 @@
+import time
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.transaction import atomic
+from api.buffers import VoteBuffer
+from api.signals import adjust_card_scores
+from api.models import BingoCard, BingoCardCategory, SiteUser
+
+
+class Command(BaseCommand):
+    help = 'Compares votes/sec of per-vote scoring against the batched vote buffer. Changes are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=2000)
+        parser.add_argument('--cards', type=int, default=1, help='Cards the votes are spread over.')
+        parser.add_argument('--interval', type=int, default=100, help='Buffer flush interval in ms.')
+
+    def handle(self, *args, **options):
+        votes = options['votes']
+
+        with atomic():
+            card_ids = create_cards(options['cards'])
+
+            start = time.perf_counter()
+            for i in range(votes):
+                adjust_card_scores(card_ids[i % len(card_ids)], 1, 1)
+            signal_rate = votes / (time.perf_counter() - start)
+
+            # flushed inline so everything stays inside this transaction
+            buffer = VoteBuffer(interval=options['interval'] / 1000, max_pending=votes, background=False)
+            start = last_flush = time.perf_counter()
+            for i in range(votes):
+                buffer.add(card_ids[i % len(card_ids)], 1, 1)
+                now = time.perf_counter()
+                if now - last_flush >= buffer.interval:
+                    buffer.flush()
+                    last_flush = now
+            buffer.flush()
+            buffer_rate = votes / (time.perf_counter() - start)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'signal path: {signal_rate:,.0f} votes/sec')
+        self.stdout.write(f'vote buffer: {buffer_rate:,.0f} votes/sec ({buffer_rate / signal_rate:.1f}x)')
+
+
+def create_cards(count: int):
+    auth_user = User.objects.create_user(username='bench_votes', password=None)
+    author = SiteUser.objects.create(name=auth_user.username, auth_user=auth_user)
+    category = BingoCardCategory.objects.create(name='bench_votes', author=author)
+
+    return [
+        BingoCard.objects.create(name=f'bench card {i}', author=author, category=category,
+                                 score=0, ups=0, votes_total=0).id
+        for i in range(count)
+    ]
@@ -5,8 +5,10 @@ from django.core.management.base import BaseCommand
 from random import sample, randint, choice
 from django.contrib.auth.models import User
 from django.db.transaction import atomic
-from libreddit_sort import hot_score, best_score
+from api.sorting import hot_score, best_score
 from api.signals import create_hashtags, create_unix_timestamp
+from api.management.commands.reconcile_counts import reconcile_category_counts
+from api.management.commands.refresh_leaderboards import refresh_leaderboards
 from api.models import (
     BingoCard,
     BingoTile,
@@ -256,6 +258,7 @@ def init_db_new():
     for card in dummy_data.cards:
         create_unix_timestamp(card.obj)
         create_hashtags(card.obj)
+        card.obj.hot = hot_score(1, 1, card.obj.created_timestamp)
 
     BingoCard.objects.bulk_update(
         [card.obj for card in dummy_data.cards],
@@ -276,6 +279,10 @@ def init_db_new():
                                 card=card.obj,
                                 up=True)
 
+    # cards were bulk created, so their categories' counts need a recount
+    reconcile_category_counts()
+    refresh_leaderboards()
+
 
 def init_db():
     site_me = db_check()
@@ -330,6 +337,7 @@ def init_db():
         for c in cards:
             create_unix_timestamp(c)
             create_hashtags(c)
+            c.hot = hot_score(1, 1, c.created_timestamp)
 
     BingoCard.objects.bulk_update(cards, ['created_timestamp', 'hot'])
 
@@ -362,6 +370,9 @@ def init_db():
         for index, card in enumerate(cards)
     ])
 
+    reconcile_category_counts()
+    refresh_leaderboards()
+
 
 all_tag_texts = [
     'monke',
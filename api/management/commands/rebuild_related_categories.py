@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.transaction import atomic
+from api.models import RelatedCategory, Subscription
+
+
+@atomic
+def rebuild_related_categories() -> int:
+    '''
+    Recomputes every co-subscription count with one self join over
+    subscriptions. Returns the number of category pairs written.
+    '''
+
+    related = RelatedCategory._meta.db_table
+    subscription = Subscription._meta.db_table
+
+    RelatedCategory.objects.all().delete()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            INSERT INTO {related} (category_id, related_id, shared)
+            SELECT a.category_id, b.category_id, COUNT(*)
+            FROM {subscription} a
+            JOIN {subscription} b ON a.user_id = b.user_id AND a.category_id <> b.category_id
+            GROUP BY a.category_id, b.category_id
+        ''')
+        return cursor.rowcount
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the related categories table from subscriptions. Safe to run on a schedule.'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        pairs = rebuild_related_categories()
+        self.stdout.write(f'Wrote {pairs} related category pairs in {time.perf_counter() - start:.1f}s.')
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+from api.dedup import result_filters, result_key
+from api.models import BingoResult, ResultFilter
+
+
+@atomic
+def rebuild_result_filters() -> int:
+    '''
+    Replaces the stored result filters with ones built from the results log
+    of the current window. Returns how many results went in.
+    '''
+
+    since = datetime.fromtimestamp(result_filters.oldest_bucket() * result_filters.bucket_seconds, timezone.utc)
+    results = (BingoResult.objects
+               .filter(created_at__gte=since)
+               .values_list('session', 'card_id', 'category_id', 'seed', 'created_at')
+               .iterator(chunk_size=10000))
+
+    count = 0
+
+    def keys():
+        nonlocal count
+        for session, card_id, category_id, seed, created_at in results:
+            count += 1
+            yield result_key(session, card_id, category_id, seed), created_at.timestamp()
+
+    filters = result_filters.build(keys())
+    ResultFilter.objects.all().delete()
+    ResultFilter.objects.bulk_create([
+        ResultFilter(bucket=bucket, hashes=bloom.hashes, bits=bytes(bloom.bits))
+        for bucket, bloom in filters.items()
+    ])
+    return count
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the stored first-result filters from the results log, for when they were lost or '
+            'their settings changed. Workers merge them in at their next persist.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Rebuilt the result filters from {rebuild_result_filters()} results.')
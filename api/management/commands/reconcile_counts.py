@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.transaction import atomic
+from api.models import BingoCard, BingoCardCategory, Subscription
+
+
+def count_of(model):
+    '''Per-category row count of `model`, for use in a category queryset.'''
+    return Coalesce(Subquery(
+        model.objects
+        .filter(category=OuterRef('pk'))
+        .order_by()
+        .values('category')
+        .annotate(n=Count('id'))
+        .values('n')
+    ), 0)
+
+
+@atomic
+def reconcile_category_counts() -> int:
+    '''
+    Recounts subscriber_count and card_count and fixes the categories that
+    drifted. Returns how many were fixed.
+    '''
+
+    drifted = list(BingoCardCategory.objects
+                   .annotate(subscribers_real=count_of(Subscription), cards_real=count_of(BingoCard))
+                   .filter(~Q(subscriber_count=F('subscribers_real')) | ~Q(card_count=F('cards_real')))
+                   .values_list('id', flat=True))
+
+    if drifted:
+        BingoCardCategory.objects.filter(id__in=drifted).update(
+            subscriber_count=count_of(Subscription),
+            card_count=count_of(BingoCard),
+        )
+
+    return len(drifted)
+
+
+class Command(BaseCommand):
+    help = 'Repairs the denormalized subscriber and card counts on categories.'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_category_counts()
+        self.stdout.write(f'Fixed counts on {fixed} categories.')
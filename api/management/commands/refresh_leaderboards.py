@@ -0,0 +1,84 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.transaction import atomic
+from django.utils import timezone
+from api.filters import date_deltas, leaderboard_orderings
+from api.models import BingoCard, Leaderboard
+
+
+@atomic
+def refresh_leaderboards(size: int = None) -> int:
+    '''
+    Recomputes the top `size` cards of every `from` window for each
+    leaderboard ordering, across all categories and per category. Returns
+    how many leaderboards were written.
+    '''
+
+    size = size or settings.LEADERBOARD_SIZE
+    now = timezone.now()
+
+    # (window, ordering, category id or None) -> card ids
+    boards = {}
+    for window, interval in date_deltas.items():
+        cutoff = now - timedelta(**interval)
+        for ordering in leaderboard_orderings:
+            boards[window, ordering, None] = list(BingoCard.objects
+                                                  .filter(created_at__gte=cutoff)
+                                                  .order_by(f'-{ordering}', '-id')
+                                                  .values_list('id', flat=True)[:size])
+
+            for category_id, card_id in top_cards_per_category(cutoff, ordering, size):
+                boards.setdefault((window, ordering, category_id), []).append(card_id)
+
+    Leaderboard.objects.all().delete()
+    Leaderboard.objects.bulk_create([
+        Leaderboard(window=window, ordering=ordering, category_id=category_id, refreshed_at=now)
+        for window, ordering, category_id in boards
+    ], batch_size=1000)
+
+    # sqlite doesn't return the new ids from bulk_create
+    board_ids = {
+        (window, ordering, category_id): board_id
+        for board_id, window, ordering, category_id
+        in Leaderboard.objects.values_list('id', 'window', 'ordering', 'category_id')
+    }
+
+    Through = Leaderboard.cards.through
+    Through.objects.bulk_create([
+        Through(leaderboard_id=board_ids[key], bingocard_id=card_id)
+        for key, card_ids in boards.items()
+        for card_id in card_ids
+    ], batch_size=5000)
+
+    return len(boards)
+
+
+def top_cards_per_category(cutoff, ordering: str, size: int):
+    '''(category id, card id) of the top `size` cards in each category created since `cutoff`.'''
+
+    # ordering comes from leaderboard_orderings, never from a request
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT category_id, id FROM (
+                SELECT category_id, id, ROW_NUMBER() OVER (
+                    PARTITION BY category_id ORDER BY {ordering} DESC, id DESC
+                ) AS position
+                FROM {BingoCard._meta.db_table}
+                WHERE created_at >= %s
+            ) ranked
+            WHERE position <= %s
+            ORDER BY category_id, position
+        ''', [cutoff, size])
+        return cursor.fetchall()
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the precomputed `from` window leaderboards. Meant to run on a schedule.'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        boards = refresh_leaderboards()
+        self.stdout.write(f'Wrote {boards} leaderboards in {time.perf_counter() - start:.1f}s.')
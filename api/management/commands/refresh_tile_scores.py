@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.db.transaction import atomic
+from api.sorting import best_scores
+from api.models import BingoTile, TileCounter
+
+
+@atomic
+def refresh_tile_scores() -> int:
+    '''
+    Sums every tile's counter shards and stores the Wilson score of its hits
+    out of its exposures, the same confidence bound cards are ranked by, as
+    the tile's score. Returns how many tiles were scored.
+    '''
+
+    counts = list(TileCounter.objects
+                  .order_by('tile_id')
+                  .values('tile_id')
+                  .annotate(hits=Sum('hits'), exposures=Sum('exposures'))
+                  .values_list('tile_id', 'hits', 'exposures'))
+    if not counts:
+        return 0
+
+    tile_ids, hits, exposures = zip(*counts)
+    scores = best_scores(hits, exposures)
+    BingoTile.objects.bulk_update([
+        BingoTile(id=tile_id, score=float(score))
+        for tile_id, score in zip(tile_ids, scores)
+    ], ['score'], batch_size=1000)
+
+    return len(counts)
+
+
+class Command(BaseCommand):
+    help = ("Stores each tile's score from its result counters. Meant to run on a schedule, "
+            'generated card pools pick the new scores up as they reload.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Scored {refresh_tile_scores()} tiles.')
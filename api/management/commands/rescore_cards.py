@@ -0,0 +1,89 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.transaction import atomic
+from api.sorting import hot_scores, best_scores
+from api.models import BingoCard, SiteUser, Vote
+
+
+class Command(BaseCommand):
+    help = 'Recomputes ups, votes_total, score, hot and best for every card from its votes, then author scores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        total = BingoCard.objects.count()
+        done = 0
+        start = time.perf_counter()
+
+        # iterator() streams through a server-side cursor on postgres
+        rows = (BingoCard.objects
+                .order_by('id')
+                .values_list('id', 'created_at')
+                .iterator(chunk_size=chunk_size))
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                done += rescore_chunk(chunk)
+                chunk = []
+                self.report(done, total, start)
+
+        if chunk:
+            done += rescore_chunk(chunk)
+            self.report(done, total, start)
+
+        SiteUser.objects.update(score=Coalesce(Subquery(
+            BingoCard.objects
+            .filter(author=OuterRef('pk'))
+            .order_by()
+            .values('author')
+            .annotate(total=Sum('score'))
+            .values('total')
+        ), 0))
+
+        self.stdout.write(f'Rescored {done} cards and all author scores in {time.perf_counter() - start:.1f}s.')
+
+    def report(self, done: int, total: int, start: float):
+        rate = done / (time.perf_counter() - start)
+        self.stdout.write(f'{done}/{total} cards ({rate:,.0f} cards/sec)')
+
+
+def rescore_chunk(rows) -> int:
+    '''
+    Rescores one chunk of (card id, created_at) rows with a single GROUP BY
+    over their votes and one bulk_update. Returns the number of cards written.
+    '''
+
+    ids = [card_id for card_id, _ in rows]
+    counts = {
+        v['card_id']: (v['ups'], v['total'])
+        for v in (Vote.objects
+                  .filter(card_id__in=ids)
+                  .order_by()
+                  .values('card_id')
+                  .annotate(ups=Count('id', filter=Q(up=True)), total=Count('id')))
+    }
+
+    ups = [counts.get(card_id, (0, 0))[0] for card_id in ids]
+    totals = [counts.get(card_id, (0, 0))[1] for card_id in ids]
+    timestamps = [created_at.timestamp() for _, created_at in rows]
+
+    cards = [
+        BingoCard(id=card_id, ups=up, votes_total=total, score=up - (total - up),
+                  created_timestamp=timestamp, hot=hot, best=best)
+        for card_id, up, total, timestamp, hot, best in zip(
+            ids, ups, totals, timestamps,
+            hot_scores(ups, totals, timestamps),
+            best_scores(ups, totals),
+        )
+    ]
+
+    with atomic():
+        BingoCard.objects.bulk_update(cards, ['ups', 'votes_total', 'score', 'created_timestamp', 'hot', 'best'])
+
+    return len(cards)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.feeds import feed_store
+
+
+class Command(BaseCommand):
+    help = 'Drops home feed entries past HOME_FEED_LENGTH. Safe to run on a schedule.'
+
+    def handle(self, *args, **options):
+        dropped = feed_store.trim()
+        self.stdout.write(f'Dropped {dropped} feed entries.')
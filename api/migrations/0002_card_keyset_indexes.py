@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bingocard',
+            index=models.Index(fields=['hot', 'id'], name='api_bingoca_hot_1c2b0a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bingocard',
+            index=models.Index(fields=['best', 'id'], name='api_bingoca_best_a77d41_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bingocard',
+            index=models.Index(fields=['created_at', 'id'], name='api_bingoca_created_09dcb2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bingocard',
+            index=models.Index(fields=['score', 'id'], name='api_bingoca_score_307577_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counts(apps, schema_editor):
+    BingoCardCategory = apps.get_model('api', 'BingoCardCategory')
+    Subscription = apps.get_model('api', 'Subscription')
+    BingoCard = apps.get_model('api', 'BingoCard')
+
+    def count_of(model):
+        return Coalesce(Subquery(
+            model.objects
+            .filter(category=OuterRef('pk'))
+            .order_by()
+            .values('category')
+            .annotate(n=Count('id'))
+            .values('n')
+        ), 0)
+
+    BingoCardCategory.objects.update(
+        subscriber_count=count_of(Subscription),
+        card_count=count_of(BingoCard),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_card_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bingocardcategory',
+            name='card_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bingocardcategory',
+            name='subscriber_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='bingocardcategory',
+            index=models.Index(fields=['subscriber_count'], name='api_bingoca_subscri_c335bd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bingocardcategory',
+            index=models.Index(fields=['card_count'], name='api_bingoca_card_co_34a958_idx'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
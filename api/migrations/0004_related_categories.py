@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_related(apps, schema_editor):
+    related = apps.get_model('api', 'RelatedCategory')._meta.db_table
+    subscription = apps.get_model('api', 'Subscription')._meta.db_table
+
+    schema_editor.execute(f'''
+        INSERT INTO {related} (category_id, related_id, shared)
+        SELECT a.category_id, b.category_id, COUNT(*)
+        FROM {subscription} a
+        JOIN {subscription} b ON a.user_id = b.user_id AND a.category_id <> b.category_id
+        GROUP BY a.category_id, b.category_id
+    ''')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_category_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedCategory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shared', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related', to='api.bingocardcategory')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.bingocardcategory')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='relatedcategory',
+            index=models.Index(fields=['category', '-shared'], name='api_related_categor_4e030b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='relatedcategory',
+            constraint=models.UniqueConstraint(fields=('category', 'related'), name='unique_related_category'),
+        ),
+        migrations.RunPython(fill_related, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:44
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# postgres only, so they live here instead of in the models' Meta
+search_indexes = {
+    'BingoCard': GinIndex(SearchVector('name', config='english'), name='api_bingocard_name_fts'),
+    'BingoCardCategory': GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='api_category_name_trgm'),
+}
+
+
+def add_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in search_indexes.items():
+        schema_editor.add_index(apps.get_model('api', model_name), index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in search_indexes.items():
+        schema_editor.remove_index(apps.get_model('api', model_name), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_related_categories'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
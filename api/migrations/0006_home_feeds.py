@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    feed = apps.get_model('api', 'FeedEntry')._meta.db_table
+    card = apps.get_model('api', 'BingoCard')._meta.db_table
+    subscription = apps.get_model('api', 'Subscription')._meta.db_table
+
+    # the newest 500 (the default HOME_FEED_LENGTH) subscribed cards per user
+    schema_editor.execute(f'''
+        INSERT INTO {feed} (user_id, card_id, category_id, created_at)
+        SELECT user_id, card_id, category_id, created_at FROM (
+            SELECT s.user_id, c.id AS card_id, c.category_id, c.created_at, ROW_NUMBER() OVER (
+                PARTITION BY s.user_id ORDER BY c.created_at DESC, c.id DESC
+            ) AS position
+            FROM {subscription} s
+            JOIN {card} c ON c.category_id = s.category_id
+        ) ranked
+        WHERE position <= 500
+    ''')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.bingocard')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.bingocardcategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to='api.siteuser')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-created_at', '-card'], name='api_feedent_user_id_3bd25b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'category'], name='api_feedent_user_id_a3f984_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'card'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
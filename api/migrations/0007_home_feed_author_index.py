@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_home_feeds'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bingocard',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='api_bingoca_author__cfb39c_idx'),
+        ),
+    ]
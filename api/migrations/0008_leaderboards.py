@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_home_feed_author_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=10)),
+                ('ordering', models.CharField(max_length=10)),
+                ('refreshed_at', models.DateTimeField()),
+                ('cards', models.ManyToManyField(related_name='leaderboards', to='api.BingoCard')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.bingocardcategory')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['window', 'ordering', 'category'], name='api_leaderb_window_9155f5_idx'),
+        ),
+    ]
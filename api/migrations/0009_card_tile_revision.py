@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bingocard',
+            name='tile_revision',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_card_tile_revision'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bingocard',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_card_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TileCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.SmallIntegerField()),
+                ('hits', models.IntegerField(default=0)),
+                ('exposures', models.IntegerField(default=0)),
+                ('tile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='api.bingotile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BingoResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('seed', models.BigIntegerField(null=True)),
+                ('version', models.BigIntegerField(null=True)),
+                ('mask', models.IntegerField()),
+                ('card', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.bingocard')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.bingocardcategory')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.siteuser')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='tilecounter',
+            constraint=models.UniqueConstraint(fields=('tile', 'shard'), name='unique_tile_counter_shard'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_tile_results'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultFilter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(unique=True)),
+                ('hashes', models.SmallIntegerField()),
+                ('bits', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bingoresult',
+            name='session',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='bingoresult',
+            index=models.Index(fields=['created_at'], name='api_bingore_created_a76c16_idx'),
+        ),
+    ]
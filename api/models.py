@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 #tile_fields = [f'tile_{i}' for i in range(1, 26)]
 
@@ -33,8 +34,16 @@ class BingoCardCategory(models.Model):
                                          through='Subscription',
                                          related_name='subscriptions')
 
+    # kept up to date by signals, see reconcile_counts to repair them
+    subscriber_count = models.IntegerField(default=0)
+    card_count = models.IntegerField(default=0)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['subscriber_count']),
+            models.Index(fields=['card_count']),
+        ]
 
 
 class Follow(models.Model):
@@ -65,6 +74,27 @@ class Subscription(models.Model):
         ]
 
 
+class RelatedCategory(models.Model):
+    '''
+    How many users are subscribed to both `category` and `related`. Kept up
+    to date on subscribe/unsubscribe, and rebuilt by rebuild_related_categories.
+    '''
+
+    category = models.ForeignKey(BingoCardCategory, on_delete=models.CASCADE, related_name='related')
+    related = models.ForeignKey(BingoCardCategory, on_delete=models.CASCADE, related_name='+')
+    shared = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['category', 'related'],
+                name='unique_related_category')
+        ]
+        indexes = [
+            models.Index(fields=['category', '-shared']),
+        ]
+
+
 class BingoCard(models.Model):
     name = models.CharField(max_length=50)
 
@@ -72,11 +102,14 @@ class BingoCard(models.Model):
                                related_name='cards_created',
                                on_delete=models.CASCADE)
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    # set before the insert so created_timestamp and hot can go in with it
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     created_timestamp = models.FloatField(default=0)
 
+    # also moved by vote scoring and tile edits, it's the card's Last-Modified
     edited_at = models.DateTimeField(auto_now=True)
     edited_timestamp = models.FloatField(default=0)
+    tile_revision = models.IntegerField(default=0)
 
     category = models.ForeignKey(BingoCardCategory,
                                  related_name='cards',
@@ -90,6 +123,15 @@ class BingoCard(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # (sort column, id) pairs for keyset pagination
+        indexes = [
+            models.Index(fields=['hot', 'id']),
+            models.Index(fields=['best', 'id']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['score', 'id']),
+            # per author streams of the home feed
+            models.Index(fields=['author', 'created_at', 'id']),
+        ]
 
     def __str__(self):
         return f'''
@@ -107,6 +149,48 @@ Card {self.id}:
 '''
 
 
+class FeedEntry(models.Model):
+    '''
+    A card in a user's home feed, pushed when the card is created in one of
+    their subscribed categories. Used by DatabaseFeedStore in api/feeds.py.
+    '''
+
+    user = models.ForeignKey(SiteUser, on_delete=models.CASCADE, related_name='feed')
+    card = models.ForeignKey(BingoCard, on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey(BingoCardCategory, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'card'],
+                name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-card']),
+            models.Index(fields=['user', 'category']),
+        ]
+
+
+class Leaderboard(models.Model):
+    '''
+    The top cards created within a `from` window by one ordering, across all
+    categories or in one. Filled by refresh_leaderboards, read by
+    LeaderboardFilter.
+    '''
+
+    window = models.CharField(max_length=10)  # a key of filters.date_deltas
+    ordering = models.CharField(max_length=10)
+    category = models.ForeignKey(BingoCardCategory, null=True, on_delete=models.CASCADE, related_name='+')
+    refreshed_at = models.DateTimeField()
+    cards = models.ManyToManyField(BingoCard, related_name='leaderboards')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['window', 'ordering', 'category']),
+        ]
+
+
 class BingoTile(models.Model):
     text = models.CharField(max_length=200)
     score = models.FloatField(default=0)
@@ -115,6 +199,61 @@ class BingoTile(models.Model):
                              on_delete=models.CASCADE)
 
 
+class TileCounter(models.Model):
+    '''
+    One shard of a tile's bingo result counts: how many results showed the
+    tile and how many had it marked. A tile's totals are the sums over its
+    shards, spread so that results for a popular tile don't all wait on the
+    same row. Written by api.buffers.add_tile_counts, summed into
+    BingoTile.score by refresh_tile_scores.
+    '''
+
+    tile = models.ForeignKey(BingoTile, on_delete=models.CASCADE, related_name='counters')
+    shard = models.SmallIntegerField()
+    hits = models.IntegerField(default=0)
+    exposures = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tile', 'shard'],
+                name='unique_tile_counter_shard')
+        ]
+
+
+class BingoResult(models.Model):
+    '''
+    A completed bingo card: the card played, or the category, seed and pool
+    version it was generated from, and a 25 bit mask of the marked tiles
+    (bit i is the card's i-th tile).
+    '''
+
+    created_at = models.DateTimeField(default=timezone.now)
+    category = models.ForeignKey(BingoCardCategory, on_delete=models.CASCADE, related_name='+')
+    card = models.ForeignKey(BingoCard, null=True, on_delete=models.CASCADE, related_name='+')
+    seed = models.BigIntegerField(null=True)
+    version = models.BigIntegerField(null=True)
+    mask = models.IntegerField()
+    user = models.ForeignKey(SiteUser, null=True, on_delete=models.SET_NULL, related_name='+')
+    # who sent it, see api.dedup
+    session = models.CharField(max_length=40, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+
+class ResultFilter(models.Model):
+    '''
+    The stored Bloom filter of one time bucket of results, see api.dedup.
+    '''
+
+    bucket = models.BigIntegerField(unique=True)
+    hashes = models.SmallIntegerField()
+    bits = models.BinaryField()
+
+
 class Hashtag(models.Model):
     name = models.CharField(max_length=20, unique=True)
     categories = models.ManyToManyField(BingoCardCategory, related_name='hashtags')
@@ -0,0 +1,104 @@
+'''
+Faster JSON for the API.
+
+Renders and parses with orjson when it's installed, and falls back to the
+stock rest_framework classes otherwise. The output is byte for byte what
+JSONRenderer writes: compact, UTF-8, \\u2028 and \\u2029 escaped, and types
+JSON doesn't have (datetimes, Decimals, lazy strings, ...) converted by
+rest_framework's own encoder. Whatever orjson would write differently is
+handed to the stock renderer instead:
+
+- indented output, like the browsable API asks for
+- ints over 64 bits, which orjson refuses
+- floats under 1e-4, which orjson writes as 0.00001 or 1e-7 where Python
+  writes 1e-05 and 1e-07
+
+The one difference left is NaN and infinity, which the stock renderer
+refuses and orjson writes as null.
+
+Parsing goes back to the stock parser for errors, so they read the same, and
+for bodies with 19 or more digits in a row, since orjson reads ints past
+64 bits as floats.
+'''
+
+import io
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_digits = b'0123456789'
+# every digit to 0 and everything else to a space, runs of digits are then a
+# plain substring search, which is much faster than a regex
+_digit_runs = bytes(ord('0') if i in _digits else ord(' ') for i in range(256))
+
+
+def has_small_float(rendered: bytes) -> bool:
+    '''
+    Whether orjson output may hold a float under 1e-4, written as 0.00001 or
+    1e-7. False alarms from strings only cost a stock render.
+    '''
+    if b'0.0000' in rendered:
+        return True
+
+    i = rendered.find(b'e-')
+    while i > 0:
+        if rendered[i - 1] in _digits:
+            return True
+        i = rendered.find(b'e-', i + 2)
+    return False
+
+
+def has_big_int(body: bytes) -> bool:
+    '''Whether a JSON body may hold an int past 64 bits, at least 19 digits in a row.'''
+    return b'0' * 19 in body.translate(_digit_runs)
+
+
+class FastJSONRenderer(JSONRenderer):
+    # converts what orjson can't write natively, the same way the stock renderer does
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self.can_render(accepted_media_type, renderer_context or {}) or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if has_small_float(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+    def can_render(self, accepted_media_type, renderer_context) -> bool:
+        '''Whether the settings and request ask for output orjson writes the same.'''
+        return (orjson is not None and self.compact and not self.ensure_ascii and self.strict
+                and self.get_indent(accepted_media_type, renderer_context) is None)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if has_big_int(body):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
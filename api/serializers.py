@@ -9,14 +9,23 @@ from .models import (
     #CategorySubscription,
     #UserSubscription,
     Subscription,
+    RelatedCategory,
     Follow,
     Hashtag,
+    BingoResult,
 )
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.validators import EmailValidator
 from django.db import IntegrityError
-from django.db.transaction import atomic
+from django.db.models import F
+from django.db.transaction import atomic, on_commit
+from django.utils import timezone
 from rest_framework import serializers
+from .buffers import apply_results, result_buffer
+from .caching import bump_versions
+from .generator import CARD_TILES, MAX_SEED, card_generator, check_card_signature
+from .sorting import hot_score, best_score
 #from libreddit_sort import hot_score, best_score
 
 is_immutable = {'required': False, 'read_only': True}
@@ -69,6 +78,57 @@ class UserCreateSerializer(serializers.Serializer):
 #######################
 
 
+def viewer_state(site_user: SiteUser, cards=(), categories=(), users=()) -> dict:
+    '''
+    The viewer specific state of the given ids, kept out of the public
+    payloads so those can be cached and shared. One query per kind of object:
+    the viewer's vote on each card (True, False or None), whether they are
+    subscribed to each category and whether they follow each user.
+    '''
+    state = {'cards': {}, 'categories': {}, 'users': {}}
+
+    if cards:
+        state['cards'] = {card_id: None for card_id in cards}
+        state['cards'].update(Vote.objects
+                              .filter(user=site_user, card_id__in=cards)
+                              .values_list('card_id', 'up'))
+
+    if categories:
+        state['categories'] = {category_id: False for category_id in categories}
+        state['categories'].update(
+            (category_id, True)
+            for category_id in Subscription.objects
+            .filter(user=site_user, category_id__in=categories)
+            .values_list('category_id', flat=True)
+        )
+
+    if users:
+        # Follow rows are stored followee -> follower, see SiteUser.followers
+        state['users'] = {user_id: False for user_id in users}
+        state['users'].update(
+            (user_id, True)
+            for user_id in Follow.objects
+            .filter(follower_id__in=users, followee=site_user)
+            .values_list('follower_id', flat=True)
+        )
+
+    return state
+
+
+def id_list():
+    return serializers.ListField(child=serializers.IntegerField(min_value=1), default=list, max_length=200)
+
+
+class ViewerStateSerializer(serializers.Serializer):
+    cards = id_list()
+    categories = id_list()
+    users = id_list()
+
+
+class GenerateCardSerializer(serializers.Serializer):
+    seed = serializers.IntegerField(min_value=0, max_value=MAX_SEED, required=False)
+
+
 class HashtagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Hashtag
@@ -76,49 +136,28 @@ class HashtagSerializer(serializers.ModelSerializer):
 
 
 class CategoryRelatedSerializer(serializers.ModelSerializer):
-    is_subscribed = serializers.SerializerMethodField()
     subscriber_count = serializers.SerializerMethodField()
 
     class Meta:
         model = BingoCardCategory
-        fields = ['name', 'id', 'icon_url', 'is_subscribed', 'subscriber_count']
+        fields = ['name', 'id', 'icon_url', 'subscriber_count']
 
     def get_subscriber_count(self, category: BingoCardCategory):
-        return category.subscribers.count()
-
-    def get_is_subscribed(self, category: BingoCardCategory):
-        user = self.context['request'].user
-        try:
-            site_user = user.site_user
-        except AttributeError:
-            pass
-        else:
-            return category.subscribers.filter(id=site_user.id).exists()
+        return category.subscriber_count
 
 
 class UserDetailSerializer(serializers.ModelSerializer):
     categories_created = CategoryRelatedSerializer(many=True)
-    is_following = serializers.SerializerMethodField()
 
     class Meta:
         model = SiteUser
-        fields = ['name', 'id', 'score', 'created_at', 'is_following', 'categories_created']
-
-    def get_is_following(self, followee: SiteUser):
-        user = self.context['request'].user
-        try:
-            follower = user.site_user
-        except AttributeError:
-            pass
-        else:
-            return followee.followers.filter(id=follower.id).exists()
+        fields = ['name', 'id', 'score', 'created_at', 'categories_created']
 
 
 class CategorySerializer(serializers.ModelSerializer):
     author = UserDetailSerializer(**is_immutable)
     hashtags = HashtagSerializer(many=True)
     created_at = serializers.DateTimeField(**is_immutable)
-    is_subscribed = serializers.SerializerMethodField()
     subscriber_count = serializers.SerializerMethodField()
     related_categories = serializers.SerializerMethodField()
 
@@ -129,7 +168,7 @@ class CategorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = BingoCardCategory
-        fields = ['name', 'author', 'id', 'created_at', 'is_subscribed', 'description',
+        fields = ['name', 'author', 'id', 'created_at', 'description',
                   'subscriber_count', 'hashtags', 'banner_url', 'icon_url', 'related_categories']
         extra_kwargs = {
             field: is_immutable
@@ -137,35 +176,19 @@ class CategorySerializer(serializers.ModelSerializer):
         }
 
     def get_related_categories(self, category: BingoCardCategory):
-        request = self.context['request']
-        # subscription_set is used instead of subscribers bc subscribers doesn't give all the category ids
-        related_names = category.subscription_set.values_list('user__subscriptions__name', flat=True)
-        if not related_names.exists():
-            return []
-        related_dict = {}
-        for n in related_names:
-            related_dict[n] = related_dict.get(n, 0) + 1
-        top_10 = sorted(related_dict, key=lambda i: related_dict[i], reverse=True)[:11]
-        top_10.remove(category.name)
-        top_5 = difflib.get_close_matches(category.name, top_10, 5)
-        print(f'{top_5 = }')
-        related_objs = self.Meta.model.objects.filter(name__in=top_5)
-
-        return [CategoryRelatedSerializer(c, context={'request': request}).data
-                for c in related_objs
-                if c.id != category.id]
+        top_10 = {
+            r.related.name: r.related
+            for r in (RelatedCategory.objects
+                      .filter(category=category)
+                      .select_related('related')
+                      .order_by('-shared', 'related_id')[:10])
+        }
+        top_5 = difflib.get_close_matches(category.name, list(top_10), 5)
 
-    def get_subscriber_count(self, category: BingoCardCategory):
-        return category.subscribers.count()
+        return CategoryRelatedSerializer([top_10[name] for name in top_5], many=True, context=self.context).data
 
-    def get_is_subscribed(self, category: BingoCardCategory):
-        user = self.context['request'].user
-        try:
-            site_user = user.site_user
-        except AttributeError:
-            pass
-        else:
-            return category.subscribers.filter(id=site_user.id).exists()
+    def get_subscriber_count(self, category: BingoCardCategory):
+        return category.subscriber_count
 
     def create(self, validated_data):
         ModelClass = self.Meta.model
@@ -210,7 +233,6 @@ class UserSmallSerializer(serializers.ModelSerializer):
 
 class CardDetailSerializer(serializers.ModelSerializer):
     category = CategorySmallSerializer()
-    upvoted = serializers.SerializerMethodField()
     author = UserSmallSerializer(**is_immutable)
     tiles = TileSerializer(many=True)
     hashtags = HashtagSerializer(many=True, read_only=True)
@@ -218,7 +240,7 @@ class CardDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = BingoCard
         fields = ['id', 'score', 'name', 'author', 'created_at',
-                  'hashtags', 'upvoted', 'category', 'tiles']
+                  'hashtags', 'category', 'tiles']
 
         extra_kwargs = {
             f: is_immutable
@@ -227,30 +249,42 @@ class CardDetailSerializer(serializers.ModelSerializer):
             #'name': {'validators': [validators.length_is_(50)]},
         }
 
-    def get_upvoted(self, card):
-        user = self.context['request'].user
-        try:
-            site_user = user.site_user
-        except AttributeError:
-            pass
-        else:
-            vote = Vote.objects.filter(card=card, user=site_user).first()
-            if vote:
-                return vote.up
+    def validate_tiles(self, tile_data):
+        card = self.instance
+        if card is None:
+            return tile_data
+
+        # prefetched by CardDetail, update() diffs against the same tiles
+        tile_ids = {tile.id for tile in card.tiles.all()}
+        foreign = sorted({tile['id'] for tile in tile_data} - tile_ids)
+        if foreign:
+            raise serializers.ValidationError(f'Tiles {foreign} are not on this card.')
+        return tile_data
 
     def update(self, card, card_data):
-        '''Only changes tile data.'''
-        #card.name = card_data['name']
-        tile_data = card_data.pop('tiles')
+        '''
+        Only changes tile data, and only writes the tiles whose text changed.
+        Bumps the card's tile_revision when any did.
+        '''
+
+        new_texts = {tile['id']: tile['text'] for tile in card_data.get('tiles', [])}
+        changed = []
+        for tile in card.tiles.all():
+            text = new_texts.get(tile.id, tile.text)
+            if text != tile.text:
+                tile.text = text
+                changed.append(tile)
+
+        if not changed:
+            return card
 
-        #from pprint import pprint
-        #pprint(tile_data)
         with atomic():
-            #card.save()
-            BingoTile.objects.bulk_update([
-                BingoTile(id=tile['id'], text=tile['text'])
-                for tile in tile_data
-            ], ['text'])
+            BingoTile.objects.bulk_update(changed, ['text'])
+            # bulk_update sends no signals
+            BingoCard.objects.filter(id=card.id).update(
+                tile_revision=F('tile_revision') + 1, edited_at=timezone.now())
+            bump_versions(f'card:{card.id}')
+            on_commit(lambda: card_generator.invalidate(card.category_id))
 
         return card
 
@@ -270,12 +304,18 @@ class CardListSerializer(CardDetailSerializer):
         category = self.fields['category'].create(category_data)
         author = self.context['request'].user.site_user
 
+        # scored with the author's upvote from the start, so the card is
+        # inserted once and the vote below doesn't need the vote signals
+        created_at = timezone.now()
         card_data.update({
             'author': author,
             'category': category,
+            'created_at': created_at,
             'score': 1,
             'ups': 1,
             'votes_total': 1,
+            'hot': hot_score(1, 1, created_at.timestamp()),
+            'best': best_score(1, 1),
         })
 
         tile_data = card_data.pop('tiles')
@@ -283,19 +323,68 @@ class CardListSerializer(CardDetailSerializer):
         with atomic():
             card = CardModel.objects.create(**card_data)
 
-            Vote.objects.create(
-                user=author,
-                card=card,
-                up=True)
+            Vote.objects.bulk_create([Vote(user=author, card=card, up=True)])
+            SiteUser.objects.filter(id=author.id).update(score=F('score') + 1)
 
-            self.fields['tiles'].create(
-                [{'text': tile['text'], 'card': card}
-                 for tile in tile_data]
-            )
+            BingoTile.objects.bulk_create([
+                BingoTile(text=tile['text'], card=card)
+                for tile in tile_data
+            ])
 
         return card
 
 
+class RowSerializer(serializers.BaseSerializer):
+    '''
+    Read-only output built straight from values() rows instead of model
+    instances, for list endpoints (see RowListMixin). Views select `columns`,
+    and each row is returned as those columns unless to_representation
+    reshapes it.
+    '''
+
+    columns = []
+
+    def to_representation(self, row: dict):
+        return {column: row[column] for column in self.columns}
+
+
+class CardRowListSerializer(serializers.ListSerializer):
+    '''Looks up the hashtags of a whole page of rows in one query.'''
+
+    def to_representation(self, data):
+        rows = list(data)
+        self.child.hashtags = {}
+        for card_id, name in (Hashtag.cards.through.objects
+                              .filter(bingocard_id__in=[row['id'] for row in rows])
+                              .order_by('hashtag__name')
+                              .values_list('bingocard_id', 'hashtag__name')):
+            self.child.hashtags.setdefault(card_id, []).append({'name': name})
+
+        return super().to_representation(rows)
+
+
+class CardRowSerializer(RowSerializer):
+    '''The same output as CardListSerializer.'''
+
+    columns = ['id', 'score', 'name', 'created_at', 'author_id', 'author__name', 'category__name']
+    created_at = serializers.DateTimeField()
+    hashtags = {}
+
+    class Meta:
+        list_serializer_class = CardRowListSerializer
+
+    def to_representation(self, row: dict):
+        return {
+            'id': row['id'],
+            'score': row['score'],
+            'name': row['name'],
+            'author': {'name': row['author__name'], 'id': row['author_id']},
+            'created_at': self.created_at.to_representation(row['created_at']),
+            'hashtags': self.hashtags.get(row['id'], []),
+            'category': {'name': row['category__name']},
+        }
+
+
 class CardVoteSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(validators=[validators.card_exists])
 
@@ -360,6 +449,72 @@ class VoteSerializer(serializers.ModelSerializer):
         return vote
 
 
+class ResultSerializer(serializers.Serializer):
+    '''
+    A completed card, either a posted one (`card`) or a generated one
+    (`category`, `seed`, `version`, the ids of its `tiles` and the
+    `signature` it came with). Bit i of `mask` is set when the card's i-th
+    tile was marked.
+    '''
+
+    card = serializers.IntegerField(min_value=1, required=False)
+    category = serializers.CharField(required=False)
+    seed = serializers.IntegerField(min_value=0, max_value=MAX_SEED, required=False)
+    version = serializers.IntegerField(required=False)
+    tiles = serializers.ListField(child=serializers.IntegerField(), min_length=CARD_TILES,
+                                  max_length=CARD_TILES, required=False)
+    signature = serializers.CharField(required=False)
+    mask = serializers.IntegerField(min_value=0, max_value=2 ** CARD_TILES - 1)
+
+    def validate(self, data):
+        if 'card' in data:
+            # the card's tiles in id order, and its category, in one query
+            tiles = list(BingoTile.objects
+                         .filter(card_id=data['card'])
+                         .order_by('id')
+                         .values_list('id', 'card__category_id'))
+            if len(tiles) != CARD_TILES:
+                raise serializers.ValidationError('Invalid card id.')
+            data['tile_ids'] = [tile_id for tile_id, _ in tiles]
+            data['category_id'] = tiles[0][1]
+            return data
+
+        if not {'category', 'seed', 'version', 'tiles', 'signature'} <= data.keys():
+            raise serializers.ValidationError(
+                'Send either a card, or the category, seed, version, tiles and signature of one.')
+
+        pool = card_generator.pool(data['category'])
+        if pool is None:
+            raise serializers.ValidationError('Invalid category name.')
+        if pool.version != data['version'] or len(pool) < CARD_TILES:
+            raise serializers.ValidationError("The category's tiles changed since this card was generated.")
+        # the seed gives other tiles once scores are refreshed, the ones the card was dealt are what count
+        if not check_card_signature(data['signature'], pool.category_id, data['seed'], data['version'],
+                                    data['tiles']):
+            raise serializers.ValidationError('Invalid card signature.')
+
+        data['tile_ids'] = data['tiles']
+        data['category_id'] = pool.category_id
+        return data
+
+    def create(self, data):
+        result = BingoResult(
+            category_id=data['category_id'],
+            card_id=data.get('card'),
+            seed=data.get('seed'),
+            version=data.get('version'),
+            mask=data['mask'],
+            user=data.get('user'),
+            session=data.get('session', ''),
+        )
+
+        if settings.RESULT_BUFFER:
+            on_commit(lambda: result_buffer.add(result, data['tile_ids']))
+        else:
+            apply_results([(result, data['tile_ids'])])
+        return result
+
+
 class CategorySearchBarSerializer(serializers.ModelSerializer):
     class Meta:
         model = BingoCardCategory
@@ -372,6 +527,14 @@ class CardSearchBarSerializer(serializers.ModelSerializer):
         fields = ['name', 'id']
 
 
+class CategorySearchBarRowSerializer(RowSerializer):
+    columns = CategorySearchBarSerializer.Meta.fields
+
+
+class CardSearchBarRowSerializer(RowSerializer):
+    columns = CardSearchBarSerializer.Meta.fields
+
+
 class UserFollowSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(validators=[validators.user_exists])
 
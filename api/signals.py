@@ -1,9 +1,23 @@
 from django.dispatch import receiver
-from django.db.models.signals import post_save, pre_save, post_init, pre_init, pre_delete, post_delete
-from .models import Vote, BingoCard, SiteUser, Hashtag
-from libreddit_sort import hot_score, best_score
-from django.db.transaction import atomic
-import re
+from django.db.models.signals import post_save, pre_save, post_init, pre_init, pre_delete, post_delete, m2m_changed
+from django.conf import settings
+from .models import Vote, BingoCard, BingoCardCategory, BingoTile, SiteUser, Subscription, RelatedCategory, Hashtag
+from .buffers import bump_author_categories, vote_buffer
+from .caching import bump_versions
+from .feeds import feed_store
+from .generator import card_generator
+from .hashtags import hashtag_cache, hashtag_names, link_card_hashtags
+from .typeahead import card_index, category_index
+from .sorting import hot_score, best_score
+from django.db.transaction import atomic, on_commit
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+@receiver(pre_save, sender=BingoCard)
+def card_pre_create(sender: BingoCard, instance: BingoCard, **kwargs):
+    if instance._state.adding and not instance.created_timestamp:
+        create_unix_timestamp(instance)
 
 
 @receiver(post_save, sender=BingoCard)
@@ -11,59 +25,246 @@ def card_post_create(sender: BingoCard, instance: BingoCard, created: bool, **kw
     if not created:
         return
 
-    create_unix_timestamp(instance)
     create_hashtags(instance)
+    BingoCardCategory.objects.filter(id=instance.category_id).update(card_count=F('card_count') + 1)
+    feed_store.push(instance)
+    on_commit(lambda: card_index.add(instance.id, instance.name, instance.best))
+    # the tiles are created after the card, by the time it commits they're in
+    on_commit(lambda: card_generator.invalidate(instance.category_id))
+
+
+@receiver(post_delete, sender=BingoCard)
+def card_post_delete(sender: BingoCard, instance: BingoCard, **kwargs):
+    BingoCardCategory.objects.filter(id=instance.category_id).update(card_count=F('card_count') - 1)
+    feed_store.remove(instance)
+    # the instance loses its id once the delete is done
+    card_id, category_id = instance.id, instance.category_id
+    on_commit(lambda: card_index.remove(card_id))
+    on_commit(lambda: card_generator.invalidate(category_id))
+
+
+@receiver(post_save, sender=BingoCardCategory)
+def category_post_create(sender: BingoCardCategory, instance: BingoCardCategory, created: bool, **kwargs):
+    if created:
+        on_commit(lambda: category_index.add(instance.id, instance.name, instance.card_count))
+
+
+@receiver(post_delete, sender=BingoCardCategory)
+def category_post_delete(sender: BingoCardCategory, instance: BingoCardCategory, **kwargs):
+    on_commit(lambda: category_index.remove(instance.id))
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_post_create(sender: Subscription, instance: Subscription, created: bool, **kwargs):
+    if created:
+        adjust_subscriber_counts([instance.category_id], 1)
+        adjust_related_categories(instance.user_id, instance.category_id, 1)
+        feed_store.subscribe(instance.user_id, instance.category_id)
+
+
+@receiver(m2m_changed, sender=Subscription)
+def subscribers_added(sender: Subscription, instance, action: str, reverse: bool, pk_set, **kwargs):
+    # subscribers.add() bulk creates Subscriptions without post_save. removes
+    # and clears go through post_delete, so only adds are counted here
+    if action != 'post_add' or not pk_set:
+        return
+
+    if reverse:
+        # user.subscriptions.add(*categories)
+        adjust_subscriber_counts(pk_set, 1)
+        pairs = [(instance.id, category_id) for category_id in pk_set]
+    else:
+        # category.subscribers.add(*users)
+        BingoCardCategory.objects.filter(id=instance.id).update(
+            subscriber_count=F('subscriber_count') + len(pk_set))
+        pairs = [(user_id, instance.id) for user_id in pk_set]
+
+    for user_id, category_id in pairs:
+        adjust_related_categories(user_id, category_id, 1)
+        feed_store.subscribe(user_id, category_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_post_delete(sender: Subscription, instance: Subscription, **kwargs):
+    adjust_subscriber_counts([instance.category_id], -1)
+    adjust_related_categories(instance.user_id, instance.category_id, -1)
+    feed_store.unsubscribe(instance.user_id, instance.category_id)
+
+
+def adjust_subscriber_counts(category_ids, delta: int):
+    BingoCardCategory.objects.filter(id__in=category_ids).update(subscriber_count=F('subscriber_count') + delta)
+
+
+def adjust_related_categories(user_id: int, category_id: int, delta: int):
+    '''
+    Adds `delta` to the co-subscription counts between `category_id` and the
+    user's other subscriptions. Deleting a user removes all their
+    subscriptions at once and isn't counted here, rebuild_related_categories
+    picks that up.
+    '''
+
+    others = list(Subscription.objects
+                  .filter(user_id=user_id)
+                  .exclude(category_id=category_id)
+                  .values_list('category_id', flat=True))
+    if not others:
+        return
+
+    with atomic():
+        if delta > 0:
+            RelatedCategory.objects.bulk_create([
+                RelatedCategory(category_id=a, related_id=b)
+                for other in others
+                for a, b in [(category_id, other), (other, category_id)]
+            ], ignore_conflicts=True)
+
+        pairs = (RelatedCategory.objects
+                 .filter(Q(category_id=category_id, related_id__in=others)
+                         | Q(category_id__in=others, related_id=category_id)))
+        pairs.update(shared=F('shared') + delta)
+
+        if delta < 0:
+            pairs.filter(shared__lte=0).delete()
 
 
 def create_unix_timestamp(card: BingoCard):
-    # get unix timestamp
+    '''Sets created_timestamp from created_at, saving is up to the caller.'''
     card.created_timestamp = card.created_at.timestamp()
-    card.save()
 
 
 def create_hashtags(card: BingoCard):
-    # parse bingo card name for first 4 hashtags and create them, then add them to card and category
-    hashtags_text = re.findall(r'#(\w+)', card.name)[:4]
+    '''
+    Adds the first 4 hashtags in the card's name to the card and its category,
+    creating the ones that don't exist yet. Two statements however many
+    hashtags there are, three when one of them isn't in the hashtag cache.
+    '''
 
-    Hashtag.objects.bulk_create([
-        Hashtag(name=h.lower())
-        for h in hashtags_text
-        if len(h) <= 20
+    names = hashtag_names(card.name)
+    if not names:
+        return
+
+    hashtag_ids = list(hashtag_cache.get_or_create(names).values())
+    if link_card_hashtags(card.id, hashtag_ids) < len(hashtag_ids):
+        # another worker deleted a hashtag this one still had cached
+        hashtag_cache.clear()
+        hashtag_ids = list(hashtag_cache.get_or_create(names).values())
+        link_card_hashtags(card.id, hashtag_ids)
+
+    CategoryHashtag = Hashtag.categories.through
+    CategoryHashtag.objects.bulk_create([
+        CategoryHashtag(hashtag_id=hashtag_id, bingocardcategory_id=card.category_id)
+        for hashtag_id in hashtag_ids
     ], ignore_conflicts=True)
 
-    hashtags = Hashtag.objects.filter(name__in=hashtags_text)
 
-    card.hashtags.add(*hashtags)
-    card.category.hashtags.add(*hashtags)
+@receiver(post_delete, sender=Hashtag)
+def hashtag_post_delete(sender: Hashtag, instance: Hashtag, **kwargs):
+    hashtag_cache.discard(instance.name)
+
+
+@receiver(post_init, sender=Vote)
+def remember_vote_state(sender: Vote, instance: Vote, **kwargs):
+    # remember what the vote was when it was loaded so a later save only
+    # has to apply the difference
+    instance._saved_up = instance.__dict__.get('up') if instance.pk else None
 
 
 @receiver(post_save, sender=Vote)
 def increase_card_scores(sender: Vote, instance: Vote, created: bool, **kwargs):
-    card = instance.card
-    adjust_card_scores(card)
+    old_up = None if created else instance._saved_up
+    ups_delta, total_delta = vote_delta(old_up, instance.up)
+    instance._saved_up = instance.up
+
+    score_vote(instance.card_id, ups_delta, total_delta)
 
 
 @receiver(post_delete, sender=Vote)
 def decrease_card_scores(sender: Vote, instance: Vote, using, **kwargs):
-    card = instance.card
-    adjust_card_scores(card)
+    ups_delta, total_delta = vote_delta(instance.up, None)
+    score_vote(instance.card_id, ups_delta, total_delta)
+
 
+def vote_delta(old_up, new_up):
+    '''
+    Returns the (ups, total) change caused by a vote going from `old_up`
+    to `new_up`. `None` means there is no vote.
+    '''
 
-def adjust_card_scores(card: BingoCard):
-    up = card.votes.filter(up=True).count()
-    total = card.votes.count()
-    score = up - (total - up)
-    timestamp = card.created_at.timestamp()
+    ups_delta = int(new_up is True) - int(old_up is True)
+    total_delta = int(new_up is not None) - int(old_up is not None)
+    return ups_delta, total_delta
 
-    card.hot = hot_score(up, total, timestamp)
-    card.best = best_score(up, total)
-    card.score = score
+
+def score_vote(card_id: int, ups_delta: int, total_delta: int):
+    if not settings.VOTE_BUFFER:
+        adjust_card_scores(card_id, ups_delta, total_delta)
+        return
+
+    # only buffer votes that actually got committed
+    on_commit(lambda: vote_buffer.add(card_id, ups_delta, total_delta))
+
+
+def adjust_card_scores(card_id: int, ups_delta: int, total_delta: int):
+    '''
+    Applies a vote delta to a card and its author. Cost doesn't depend on
+    how many votes the card or author already has.
+    '''
+
+    if not ups_delta and not total_delta:
+        return
+
+    score_delta = ups_delta - (total_delta - ups_delta)
 
     with atomic():
-        card.save()
+        # row lock keeps concurrent voters from overwriting each other
+        card = (BingoCard.objects
+                .select_for_update()
+                .filter(id=card_id)
+                .values('ups', 'votes_total', 'created_timestamp', 'author_id')
+                .first())
+        if not card:
+            return
+
+        ups = card['ups'] + ups_delta
+        total = card['votes_total'] + total_delta
+
+        BingoCard.objects.filter(id=card_id).update(
+            ups=ups,
+            votes_total=total,
+            score=F('score') + score_delta,
+            hot=hot_score(ups, total, card['created_timestamp']),
+            best=best_score(ups, total),
+            edited_at=timezone.now(),
+        )
+
+        if score_delta:
+            SiteUser.objects.filter(id=card['author_id']).update(score=F('score') + score_delta)
+            bump_author_categories([card['author_id']])
+
+
+# response cache invalidation, see api/caching.py
+
+@receiver([post_save, post_delete], sender=BingoCard)
+def card_changed(sender: BingoCard, instance: BingoCard, **kwargs):
+    # categories show the hashtags of their cards
+    bump_versions('cards', f'card:{instance.id}', 'categories')
+
+
+@receiver([post_save, post_delete], sender=Vote)
+def vote_changed(sender: Vote, instance: Vote, **kwargs):
+    bump_versions('cards', f'card:{instance.card_id}')
+
+
+@receiver([post_save, post_delete], sender=BingoTile)
+def tile_changed(sender: BingoTile, instance: BingoTile, **kwargs):
+    bump_versions(f'card:{instance.card_id}')
+
+
+@receiver([post_save, post_delete], sender=BingoCardCategory)
+def category_changed(sender: BingoCardCategory, instance: BingoCardCategory, **kwargs):
+    bump_versions('categories', 'cards')
 
-        author = card.author
-        author.score = sum(author.cards_created.values_list('score', flat=True))
-        author.save()
 
-    #print(card)
+@receiver([post_save, post_delete, m2m_changed], sender=Subscription)
+def subscription_changed(sender: Subscription, **kwargs):
+    bump_versions('categories')
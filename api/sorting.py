@@ -0,0 +1,112 @@
+'''
+Card sorting scores.
+
+Uses the compiled libreddit_sort module (see sort_algo/) when it's
+available and falls back to a Python/NumPy port of it otherwise, separately
+for the per-post and the batch functions. Both give the same results,
+including the 7 place truncation of hot scores. NumPy is imported by the
+batch fallback when it first runs, so scoring single posts works without it.
+'''
+
+import math
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+Z = 1.281551565545  # 80% confidence
+EPOCH = 1134028003.0
+
+
+def _round(num, place: int = 7):
+    '''Truncates to `place` decimals, same as round() in sort_algo.'''
+    import numpy as np
+    rounder = 10.0 ** place
+    return np.trunc(num * rounder) / rounder
+
+
+def _log10(values: 'np.ndarray') -> 'np.ndarray':
+    # np.log10 may use a vectorized implementation that is off by an ulp from
+    # libm's, which can flip the truncated 7th place. scores are whole numbers
+    # with few distinct values, so go through math.log10 once per value.
+    import numpy as np
+    unique, inverse = np.unique(values, return_inverse=True)
+    return np.array([math.log10(v) for v in unique], dtype=np.float64)[inverse]
+
+
+def np_best_scores(ups, totals) -> 'np.ndarray':
+    '''Calculates best scores (Wilson score) for whole columns of posts.'''
+    import numpy as np
+
+    up = np.asarray(ups, dtype=np.float64)
+    total = np.asarray(totals, dtype=np.float64)
+    if up.shape != total.shape:
+        raise ValueError('all arguments must have the same length')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = up / total
+
+        left = p + 1.0 / (2.0 * total) * Z * Z
+        right = Z * np.sqrt(p * (1.0 - p) / total + Z * Z / (4.0 * total * total))
+        under = 1.0 + 1.0 / total * Z * Z
+
+        result = (left - right) / under
+
+    return np.where(total == 0.0, 0.0, result)
+
+
+def np_hot_scores(ups, totals, created_timestamps) -> 'np.ndarray':
+    '''Calculates hot scores for whole columns of posts.'''
+    import numpy as np
+
+    up = np.asarray(ups, dtype=np.float64)
+    total = np.asarray(totals, dtype=np.float64)
+    timestamp = np.asarray(created_timestamps, dtype=np.float64)
+    if not up.shape == total.shape == timestamp.shape:
+        raise ValueError('all arguments must have the same length')
+
+    score = total - (total - up)
+    sign = np.sign(score)
+
+    order = _log10(np.maximum(1.0, np.abs(score)))
+    seconds = timestamp - EPOCH
+    result = sign * order + seconds / 45000.0
+
+    return _round(result, 7)
+
+
+def py_best_score(up: float, total: float) -> float:
+    if total == 0:
+        return 0.0
+
+    p = up / total
+
+    left = p + 1.0 / (2.0 * total) * Z * Z
+    right = Z * math.sqrt(p * (1.0 - p) / total + Z * Z / (4.0 * total * total))
+    under = 1.0 + 1.0 / total * Z * Z
+
+    return (left - right) / under
+
+
+def py_hot_score(ups: float, total: float, created_timestamp: float) -> float:
+    score = total - (total - ups)
+    sign = 1.0 if score > 0 else -1.0 if score < 0 else 0.0
+
+    order = math.log10(max(1.0, abs(score)))
+    seconds = created_timestamp - EPOCH
+    result = sign * order + seconds / 45000.0
+
+    return math.trunc(result * 1e7) / 1e7
+
+
+try:
+    from libreddit_sort import hot_score, best_score
+except ImportError:
+    hot_score, best_score = py_hot_score, py_best_score
+
+# builds of libreddit_sort.so from before the batch functions only have the
+# scalar ones
+try:
+    from libreddit_sort import hot_scores, best_scores
+except ImportError:
+    hot_scores, best_scores = np_hot_scores, np_best_scores
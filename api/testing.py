@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from .generator import CARD_TILES
+from .management.commands.bench_search import create_cards
+from .models import BingoCard, BingoCardCategory, BingoTile, Hashtag, SiteUser
+from .serializers import CardListSerializer, CategorySerializer, UserDetailSerializer
+from .views import CARD_LIST_QUERYSET, CATEGORY_QUERYSET
+
+
+@contextmanager
+def query_budget(budget: int, using: str = 'default'):
+    '''
+    Fails if the block runs more than `budget` queries, e.g.
+
+        with query_budget(5):
+            client.get('/api/cards/')
+
+    List endpoints should fit the same budget whether the page has 1 row or
+    a full page of them.
+    '''
+
+    with CaptureQueriesContext(connections[using]) as queries:
+        yield queries
+
+    if len(queries) > budget:
+        sql = '\n'.join(q['sql'] for q in queries.captured_queries)
+        raise AssertionError(f'{len(queries)} queries run, budget is {budget}:\n{sql}')
+
+
+def site_user(name: str) -> SiteUser:
+    auth_user = User.objects.create_user(username=name, password=None)
+    return SiteUser.objects.create(name=name, auth_user=auth_user, score=0)
+
+
+def post_card(client: APIClient, name: str, category_name: str) -> BingoCard:
+    '''Creates a card of 25 tiles through the API, as `client`'s user.'''
+    response = client.post('/api/cards/', {
+        'name': name,
+        'category': {'name': category_name},
+        'tiles': [{'id': 0, 'text': f'{name} tile {i}'} for i in range(1, 26)],
+    }, format='json')
+    if response.status_code != 201:
+        raise AssertionError(f'{response.status_code} {response.data}')
+    return BingoCard.objects.get(id=response.data['id'])
+
+
+def create_list_cards(count: int):
+    '''Cards like the ones users post: a few hashtags each and unicode in some names.'''
+    create_cards(count)
+    cards = list(BingoCard.objects.order_by('-id')[:count])
+    category = BingoCardCategory.objects.get(name='bench_search')
+    category.description = 'Generated cards — «bench» ✓'
+    category.save()
+
+    hashtags = [Hashtag.objects.get_or_create(name=name)[0] for name in ['anime', 'monke', 'garnt', 'jöey']]
+    category.hashtags.add(*hashtags)
+    Through = Hashtag.cards.through
+    Through.objects.bulk_create([
+        Through(hashtag_id=hashtag.id, bingocard_id=card.id)
+        for i, card in enumerate(cards)
+        for hashtag in hashtags[:i % 4 + 1]
+    ])
+
+    for card in cards[::7]:
+        card.name = f'{card.name} 🎉 ünïcode'
+    BingoCard.objects.bulk_update(cards[::7], ['name'])
+
+
+def create_pool(author, cards: int) -> BingoCardCategory:
+    '''A category of `cards` cards with 25 different tiles each, some of them scored.'''
+    category = BingoCardCategory.objects.create(name=f'bench_generator_{cards}', author=author)
+    BingoCard.objects.bulk_create([
+        BingoCard(name=f'card {i}', author=author, category=category, score=0, ups=0, votes_total=0)
+        for i in range(cards)
+    ])
+    BingoTile.objects.bulk_create([
+        BingoTile(card_id=card_id, text=f'tile {card_id} {i}', score=(i % 5) / 4)
+        for card_id in category.cards.values_list('id', flat=True)
+        for i in range(CARD_TILES)
+    ], batch_size=5000)
+    return category
+
+
+def payloads() -> dict:
+    '''Pages of the card, category and user endpoints, like their views serialize them.'''
+    cards = list(CARD_LIST_QUERYSET.order_by('-created_at')[:100])
+    categories = list(CATEGORY_QUERYSET.order_by('-created_at')[:20])
+    users = list(SiteUser.objects.prefetch_related('categories_created').order_by('-id')[:20])
+
+    def page(results):
+        return OrderedDict([('count', 1000), ('next', 'http://testserver/api/cards/?cursor=cD0yMDIx'),
+                            ('previous', None), ('results', results)])
+
+    return {
+        'card page of 10': page(CardListSerializer(cards[:10], many=True).data),
+        'card page of 100': page(CardListSerializer(cards, many=True).data),
+        'category page': page(CategorySerializer(categories, many=True).data),
+        'user page': page(UserDetailSerializer(users, many=True).data),
+    }
+
+
+def follower_of_everything() -> SiteUser:
+    '''A user subscribed to every category and following every author, for the home feed.'''
+    user = SiteUser.objects.get(name='bench_search')
+    for category in BingoCardCategory.objects.all():
+        category.subscribers.add(user)
+    for author in SiteUser.objects.exclude(id=user.id):
+        # stored followee -> follower, see SiteUser.followers
+        author.followers.add(user)
+    return user
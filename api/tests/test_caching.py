@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.buffers import apply_vote_deltas
+from api.caching import response_cache
+from api.models import BingoCardCategory, Vote
+from api.testing import post_card, site_user
+
+
+@override_settings(RESPONSE_CACHE=True, VOTE_BUFFER=False)
+class CategoryDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        response_cache.clear()
+        self.alice = site_user('alice')
+        self.bob = site_user('bob')
+        BingoCardCategory.objects.create(name='memes', author=self.alice)
+
+        author = APIClient()
+        author.force_authenticate(self.alice.auth_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.card = post_card(author, 'card', 'memes')
+        self.client = APIClient()
+
+    def get(self, **headers):
+        response = self.client.get('/api/categories/Memes/', **headers)
+        self.assertIn(response.status_code, [200, 304])
+        return response
+
+    def author_score(self) -> int:
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        return response.json()['author']['score']
+
+    def test_vote_changes_author_score(self):
+        first = self.get()
+        score = first.json()['author']['score']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.create(user=self.bob, card=self.card, up=True)
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        self.assertEqual(self.author_score(), score + 1)
+
+    def test_buffered_votes_change_author_score(self):
+        score = self.author_score()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_vote_deltas({self.card.id: [0, 1]})
+        self.assertEqual(self.author_score(), score - 1)
+
+    def test_author_category_icon(self):
+        first = self.get()
+        BingoCardCategory.objects.create(name='memez', author=self.alice, icon_url='https://example.com/icon.png')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
@@ -0,0 +1,103 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from api.hashtags import hashtag_cache, hashtag_names
+from api.models import BingoCard, BingoCardCategory, Hashtag, Vote
+from api.testing import query_budget, site_user
+
+# queries for one POST to api/cards/, whatever the tiles and subscribers,
+# plus a few more to link hashtags when the name has any, and one more to
+# create them when some aren't in the hashtag cache (on databases where
+# upsert_hashtags is a single statement)
+CARD_CREATE_QUERIES = 11
+HASHTAG_QUERIES = 2
+HASHTAG_MISS_QUERIES = 1
+
+names = [
+    'no hashtags at all',
+    'one new #hashtag',
+    'four #new #hash #tags #here',
+    'more than #four #are #cut #off #here',
+    'existing #hashtag and #Cased #CASED ones',
+    'only #checkcached ones, #CheckCached',
+]
+
+
+def expected_queries(name: str) -> int:
+    '''Queries to create a card called `name`, given what's in the hashtag cache right now.'''
+    names = hashtag_names(name)
+    if not names:
+        return CARD_CREATE_QUERIES
+    return CARD_CREATE_QUERIES + HASHTAG_QUERIES + (HASHTAG_MISS_QUERIES if hashtag_cache.missing(names) else 0)
+
+
+class CardCreationTests(TestCase):
+    '''
+    Creating a card takes the same queries however many hashtags and category
+    subscribers it has, and the card comes out scored.
+    '''
+
+    def setUp(self):
+        self.author = site_user('author')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author.auth_user)
+
+        self.quiet = BingoCardCategory.objects.create(name='quiet', author=self.author)
+        self.busy = BingoCardCategory.objects.create(name='busy', author=self.author)
+        self.busy.subscribers.add(*[site_user(f'subscriber_{i}') for i in range(50)])
+        Hashtag.objects.create(name='checkcached')
+        hashtag_cache.get('checkcached')
+
+    def tearDown(self):
+        # it cached hashtags that get rolled back
+        hashtag_cache.clear()
+
+    def test_query_counts(self):
+        for category in [self.quiet, self.busy]:
+            for name in names:
+                with self.subTest(category=category.name, name=name):
+                    card = self.create_card(name, category.name)
+                    self.assert_created(card)
+
+    def create_card(self, name: str, category_name: str) -> BingoCard:
+        expected = expected_queries(name)
+        # the hashtag cache fills in on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            with query_budget(expected) as queries:
+                response = self.client.post('/api/cards/', {
+                    'name': name,
+                    'category': {'name': category_name},
+                    'tiles': [{'id': 0, 'text': f'tile {i}'} for i in range(1, 26)],
+                }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(queries), expected)
+        return BingoCard.objects.get(id=response.data['id'])
+
+    def assert_created(self, card: BingoCard):
+        self.assertEqual((card.ups, card.votes_total, card.score), (1, 1, 1))
+        self.assertTrue(card.hot and card.best)
+        self.assertEqual(card.created_timestamp, card.created_at.timestamp())
+        self.assertTrue(Vote.objects.filter(card=card, user=card.author, up=True).exists())
+        self.assertEqual(card.tiles.count(), 25)
+
+        expected = set(hashtag_names(card.name))
+        self.assertEqual(set(card.hashtags.values_list('name', flat=True)), expected)
+        self.assertLessEqual(expected, set(card.category.hashtags.values_list('name', flat=True)))
+
+    def test_hashtag_deleted_by_another_worker(self):
+        self.create_card('#stale', 'quiet')
+        stale_id = hashtag_cache.get('stale')
+        Hashtag.objects.filter(id=stale_id).delete()
+        # deleted by another worker, this one still has the id
+        hashtag_cache._store([('stale', stale_id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/cards/', {
+                'name': 'still #stale',
+                'category': {'name': 'quiet'},
+                'tiles': [{'id': 0, 'text': f'tile {i}'} for i in range(1, 26)],
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        card = BingoCard.objects.get(id=response.data['id'])
+        self.assertEqual(list(card.hashtags.values_list('name', flat=True)), ['stale'])
+        self.assertNotEqual(hashtag_cache.get('stale'), stale_id)
@@ -0,0 +1,60 @@
+from urllib.parse import parse_qsl, urlencode
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.testing import create_list_cards, follower_of_everything
+
+urls = [
+    '/api/cards/',
+    '/api/cards/?page=3',
+    '/api/cards/?cursor=',
+    '/api/cards/?cursor=&ordering=-best',
+    '/api/cards/?cursor=&ordering=score',
+    '/api/cards/?ordering=-hot&page=2',
+    '/api/cards/?search=anime',
+    '/api/cards/?search=anime&ordering=-relevance&cursor=',
+    '/api/cards/?hashtag=monke',
+    '/api/cards/?category=bench_search&ordering=-best&from=week',
+    '/api/home/',
+    '/api/home/?cursor=',
+    '/api/home/?ordering=-best&cursor=',
+    '/api/bar/cards/?search=anime',
+    '/api/bar/categories/?search=bench',
+]
+
+
+@override_settings(RESPONSE_CACHE=False, TYPEAHEAD_INDEX=False)
+class RowSerializerTests(TestCase):
+    '''The row serializers give the same responses as the model serializers.'''
+
+    pages = 3  # cursor pages followed per url
+
+    @classmethod
+    def setUpTestData(cls):
+        create_list_cards(300)
+        cls.user = follower_of_everything()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user.auth_user)
+
+    def test_same_responses(self):
+        for url in urls:
+            with self.subTest(url=url):
+                self.compare(url)
+
+    def compare(self, url: str):
+        for _ in range(self.pages):
+            with override_settings(ROW_SERIALIZERS=False):
+                model = self.client.get(url)
+            with override_settings(ROW_SERIALIZERS=True):
+                rows = self.client.get(url)
+
+            self.assertEqual(model.status_code, 200)
+            self.assertEqual((rows.status_code, rows.content), (model.status_code, model.content))
+
+            cursor = isinstance(model.data, dict) and model.data.get('next')
+            if not cursor:
+                return
+            path, _, query = url.partition('?')
+            params = dict(parse_qsl(query, keep_blank_values=True), cursor=cursor)
+            url = f'{path}?{urlencode(params)}'
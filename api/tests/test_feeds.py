@@ -0,0 +1,41 @@
+from django.test import TestCase
+from api.feeds import LocalFeedStore
+from api.models import BingoCard, BingoCardCategory, Subscription
+from api.testing import site_user
+
+
+class LocalFeedStoreTests(TestCase):
+    def setUp(self):
+        self.alice = site_user('alice')
+        self.bob = site_user('bob')
+        self.category = BingoCardCategory.objects.create(name='memes', author=self.alice)
+        Subscription.objects.create(user=self.bob, category=self.category)
+        self.store = LocalFeedStore(10)
+        self.store.card_ids(self.bob.id)  # loads bob's feed
+
+    def create_card(self) -> BingoCard:
+        return BingoCard.objects.create(name='card', author=self.alice, category=self.category,
+                                        score=0, ups=0, votes_total=0)
+
+    def test_push_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            card = self.create_card()
+            self.store.push(card)
+            self.assertEqual(self.store.card_ids(self.bob.id), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.store.card_ids(self.bob.id), [card.id])
+
+    def test_remove_waits_for_commit(self):
+        card = self.create_card()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.push(card)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            card_id = card.id
+            self.store.remove(card)
+            card.delete()
+            self.assertEqual(self.store.card_ids(self.bob.id), [card_id])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.store.card_ids(self.bob.id), [])
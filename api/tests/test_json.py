@@ -0,0 +1,84 @@
+import io
+import unittest
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import numpy as np
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+from api import renderers
+from api.renderers import FastJSONParser, FastJSONRenderer
+from api.testing import create_list_cards, payloads
+
+edge_cases = {
+    'datetimes': {
+        'aware': datetime(2021, 9, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        'offset': datetime(2021, 9, 1, 12, 30, tzinfo=dt_timezone(timedelta(hours=-5))),
+        'naive': datetime(2021, 9, 1, 12, 30, 15),
+        'date': date(2021, 9, 1),
+        'time': time(12, 30, 15, 500),
+        'delta': timedelta(days=1, microseconds=5),
+    },
+    'decimals': [Decimal('1.10'), Decimal('-3'), Decimal('0.00001'), Decimal('1E+3')],
+    'lazy': [gettext_lazy('Not found.'), {'detail': gettext_lazy('Authentication credentials were not provided.')}],
+    'strings': ['line separator paragraph', ''.join(map(chr, range(32))) + '"\\/\x7f\x85',
+                'ünïcödé 🎉 漢字', '', 'mentions 1e-5 and 0.00001 in text'],
+    'ints': [0, -1, 2 ** 63 - 1, -2 ** 63, 2 ** 64, -2 ** 70],
+    'floats': [0.1 + 0.2, -0.0, 1.5, 1e15, 1e16, 1e22, 2.5e300, 0.0001, 1e-05, 1.5e-07, 5e-324],
+    'keys': {7: 'int', None: 'none', False: 'bool', 2.5: 'float', 'str': 'str'},
+    'containers': [(1, 2), set(), frozenset([3]), OrderedDict(b=1, a=2), ReturnDict({'x': [ReturnDict(serializer=None)]}, serializer=None),
+                   [], {}, [[[[]]]], None, True, False],
+    'others': [uuid.UUID(int=1), b'bytes', np.arange(3), np.float64(1.5), np.int64(7)],
+}
+
+bad_bodies = [b'', b'{', b'{"a": NaN}', b'[Infinity]', b'{"a": 1,}', b"{'a': 1}", b'\xef\xbb\xbf{}',
+              b'{"big": 123456789012345678901234567890}', b'{"f": 1e400}', b'"\\ud800"', b'{"a": 1, "a": 2}']
+
+
+def outcome(function, data):
+    '''The result of function(data), or the exception it raised as (type, message).'''
+    try:
+        return function(data)
+    except (ParseError, TypeError, ValueError) as err:
+        return type(err).__name__, str(err)
+
+
+@unittest.skipIf(renderers.orjson is None, 'orjson is not installed, the fast classes are the stock ones')
+class FastJSONTests(TestCase):
+    '''The fast renderer and parser give byte for byte the output of the stock ones.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        create_list_cards(200)
+
+    def assert_same_rendering(self, data):
+        stock = outcome(JSONRenderer().render, data)
+        self.assertEqual(outcome(FastJSONRenderer().render, data), stock)
+        if isinstance(stock, bytes):
+            self.assert_same_parsing(stock)
+
+    def assert_same_parsing(self, body: bytes):
+        stock = outcome(lambda b: JSONParser().parse(io.BytesIO(b)), body)
+        fast = outcome(lambda b: FastJSONParser().parse(io.BytesIO(b)), body)
+        # NaN never equals itself, compare what they render to
+        self.assertEqual(repr(fast), repr(stock))
+
+    def test_payloads(self):
+        for name, data in payloads().items():
+            with self.subTest(name):
+                self.assert_same_rendering(data)
+
+    def test_edge_cases(self):
+        for name, data in list(edge_cases.items()) + [('all edge cases', edge_cases)]:
+            with self.subTest(name):
+                self.assert_same_rendering(data)
+
+    def test_bad_bodies(self):
+        for body in bad_bodies:
+            with self.subTest(body):
+                self.assert_same_parsing(body)
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.models import BingoCardCategory
+from api.testing import post_card, query_budget, site_user
+
+# queries per request, however many rows the page has
+budgets = {
+    '/api/cards/': 3,
+    '/api/cards/?cursor=': 2,
+    '/api/cards/?category=memes': 3,
+    '/api/categories/': 6,
+    '/api/popular/categories/': 2,
+    '/api/categories/memes/': 7,  # 3 for the ETag
+}
+
+
+@override_settings(RESPONSE_CACHE=False)
+class ListQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()  # counts are cached
+        self.alice = site_user('alice')
+        self.bob = site_user('bob')
+        for name in ['memes', 'memez']:
+            BingoCardCategory.objects.create(name=name, author=self.alice)
+
+        self.author = APIClient()
+        self.author.force_authenticate(self.alice.auth_user)
+        self.client = APIClient()
+
+    def add_cards(self, count: int):
+        for i in range(count):
+            post_card(self.author, f'card {i} #tag{i % 3}', ['memes', 'memez'][i % 2])
+
+    def assert_budgets(self, client: APIClient, urls: dict):
+        for url, budget in urls.items():
+            cache.clear()
+            with self.subTest(url=url), query_budget(budget):
+                self.assertEqual(client.get(url).status_code, 200)
+
+    def test_pages_of_one_and_many(self):
+        self.add_cards(1)
+        self.assert_budgets(self.client, budgets)
+        self.add_cards(12)
+        self.assert_budgets(self.client, budgets)
+
+    def test_user_detail(self):
+        self.add_cards(1)
+        self.assert_budgets(self.client, {f'/api/users/{self.alice.id}/': 4})
+        for i in range(5):
+            BingoCardCategory.objects.create(name=f'extra{i}', author=self.alice)
+        self.add_cards(5)
+        self.assert_budgets(self.client, {f'/api/users/{self.alice.id}/': 4})
+
+    def test_home_feed(self):
+        BingoCardCategory.objects.get(name='memes').subscribers.add(self.bob)
+        home = APIClient()
+        home.force_authenticate(self.bob.auth_user)
+
+        self.add_cards(1)
+        self.assert_budgets(home, {'/api/home/': 5})
+        self.add_cards(12)
+        self.assert_budgets(home, {'/api/home/': 5})
@@ -0,0 +1,133 @@
+from unittest import mock
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.dedup import ResultFilters, result_key
+from api.generator import card_generator, load_pool
+from api.models import BingoTile, TileCounter
+from api.testing import create_pool, site_user
+
+
+@override_settings(RESULT_BUFFER=False, RESULT_DEDUP=False)
+class GeneratedResultTests(TestCase):
+    def setUp(self):
+        self.category = create_pool(site_user('author'), 4)
+        card_generator.invalidate(self.category.id)
+        self.client = APIClient()
+
+    def tearDown(self):
+        card_generator.invalidate(self.category.id)
+
+    def generate(self) -> dict:
+        response = self.client.get(f'/api/categories/{self.category.name}/generate/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def post_result(self, card: dict, **changes):
+        return self.client.post('/api/results/', {
+            'category': card['category'],
+            'seed': card['seed'],
+            'version': card['version'],
+            'tiles': [tile['id'] for tile in card['tiles']],
+            'signature': card['signature'],
+            'mask': 1,
+            **changes,
+        }, format='json')
+
+    def test_score_refresh_keeps_the_version(self):
+        card = self.generate()
+        BingoTile.objects.filter(card__category=self.category).update(score=0.9)
+        card_generator.invalidate(self.category.id)
+        self.assertEqual(load_pool(self.category.name).version, card['version'])
+
+        self.assertEqual(self.post_result(card).status_code, 201)
+        tile_ids = [tile['id'] for tile in card['tiles']]
+        counts = TileCounter.objects.filter(tile_id__in=tile_ids).aggregate(Sum('hits'), Sum('exposures'))
+        self.assertEqual((counts['hits__sum'], counts['exposures__sum']), (1, len(tile_ids)))
+
+    def test_tiles_outside_the_pool(self):
+        card = self.generate()
+        stranger = create_pool(site_user('stranger'), 1).cards.get().tiles.values_list('id', flat=True)
+        self.assertEqual(self.post_result(card, tiles=list(stranger)).status_code, 400)
+
+        repeated = [card['tiles'][0]['id']] * len(card['tiles'])
+        self.assertEqual(self.post_result(card, tiles=repeated).status_code, 400)
+
+    def test_tiles_the_card_was_not_dealt(self):
+        card = self.generate()
+        pool = load_pool(self.category.name)
+        dealt = [tile['id'] for tile in card['tiles']]
+        others = [tile_id for tile_id in pool.ids if tile_id not in dealt]
+        self.assertEqual(self.post_result(card, tiles=others[:len(dealt)]).status_code, 400)
+        self.assertEqual(self.post_result(card, tiles=dealt[::-1]).status_code, 400)
+
+        # the signature doesn't carry over to other seeds
+        self.assertEqual(self.post_result(card, seed=card['seed'] + 1).status_code, 400)
+        self.assertEqual(self.post_result(card, signature='').status_code, 400)
+        self.assertEqual(self.post_result(card).status_code, 201)
+
+
+def result_filters() -> ResultFilters:
+    return ResultFilters(capacity=1000, error_rate=0.001, bucket_seconds=3600, window=24,
+                         interval=60, background=False)
+
+
+class ResultFiltersTests(TestCase):
+    def test_idle_worker_pulls_other_workers_keys(self):
+        busy, idle = result_filters(), result_filters()
+        other_key = result_key('session:b', 1, 1, None)
+        self.assertTrue(idle.first_seen(other_key))
+        idle.flush()
+
+        key = result_key('session:a', 1, 1, None)
+        self.assertTrue(busy.first_seen(key))
+        busy.flush()
+        idle.flush()  # nothing pending
+        self.assertFalse(idle.first_seen(key))
+
+    def test_reserved_keys_are_turned_away_until_released(self):
+        filters = result_filters()
+        key = result_key('session:a', 1, 1, None)
+        self.assertTrue(filters.reserve(key))
+        self.assertFalse(filters.reserve(key))
+        self.assertFalse(filters.first_seen(key))
+
+        filters.release(key)
+        self.assertTrue(filters.reserve(key))
+        filters.record(key)
+        self.assertFalse(filters.reserve(key))
+
+
+@override_settings(RESULT_BUFFER=False, RESULT_DEDUP=True)
+class ResultDedupTests(TestCase):
+    def setUp(self):
+        category = create_pool(site_user('author'), 1)
+        self.card = category.cards.get()
+        self.client = APIClient()
+        self.client.force_authenticate(self.card.author.auth_user)
+        patcher = mock.patch('api.views.result_filters', result_filters())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_result(self):
+        return self.client.post('/api/results/', {'card': self.card.id, 'mask': 3}, format='json')
+
+    def test_only_the_first_result_counts(self):
+        self.assertEqual(self.post_result().status_code, 201)
+        self.assertEqual(self.post_result().status_code, 409)
+
+    def test_copy_sent_while_saving(self):
+        copies = []
+
+        def send_copy(results):
+            copies.append(self.post_result())
+
+        with mock.patch('api.serializers.apply_results', side_effect=send_copy):
+            self.assertEqual(self.post_result().status_code, 201)
+        self.assertEqual([copy.status_code for copy in copies], [409])
+
+    def test_failed_save_can_be_sent_again(self):
+        with mock.patch('api.serializers.apply_results', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.post_result()
+        self.assertEqual(self.post_result().status_code, 201)
@@ -0,0 +1,30 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.models import BingoCard, BingoCardCategory
+from api.testing import site_user
+
+
+@override_settings(RESPONSE_CACHE=False, TYPEAHEAD_INDEX=False)
+class CardSearchOrderingTests(TestCase):
+    def setUp(self):
+        author = site_user('author')
+        category = BingoCardCategory.objects.create(name='memes', author=author)
+        # newest first would be the reverse of best first
+        for best in [0.9, 0.5, 0.1]:
+            BingoCard.objects.create(name=f'monke {best}', author=author, category=category,
+                                     score=0, ups=0, votes_total=0, best=best)
+        self.client = APIClient()
+
+    def names(self, url: str):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [card['name'] for card in response.data['results']]
+
+    def test_searches_default_to_relevance(self):
+        # relevance is best outside of postgres
+        self.assertEqual(self.names('/api/cards/?search=monke'), ['monke 0.9', 'monke 0.5', 'monke 0.1'])
+
+    def test_explicit_ordering_wins(self):
+        self.assertEqual(self.names('/api/cards/?search=monke&ordering=-created_at'),
+                         ['monke 0.1', 'monke 0.5', 'monke 0.9'])
+        self.assertEqual(self.names('/api/cards/'), ['monke 0.1', 'monke 0.5', 'monke 0.9'])
@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from api.models import BingoCard, BingoCardCategory, BingoTile
+from api.testing import post_card, site_user
+
+# statements that write tiles, per PATCH that changes any
+TILE_WRITES = 1
+
+
+class TileUpdateTests(TestCase):
+    '''
+    Editing a card writes the changed tiles in one statement and nothing when
+    no tile changed, bumps tile_revision only on changes, and refuses tiles
+    of other cards.
+    '''
+
+    def setUp(self):
+        self.author = site_user('author')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author.auth_user)
+        BingoCardCategory.objects.create(name='tiles', author=self.author)
+
+        self.card = post_card(self.client, 'card', 'tiles')
+        self.other = post_card(self.client, 'other card', 'tiles')
+        self.tiles = list(self.card.tiles.order_by('id').values('id', 'text'))
+
+    def edit(self, changes: dict, expected_writes: int, expected_revision: int, status=200, data=None):
+        data = data or {'tiles': [{'id': t['id'], 'text': changes.get(i, t['text'])}
+                                  for i, t in enumerate(self.tiles)]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/cards/{self.card.id}/', data, format='json')
+
+        self.assertEqual(response.status_code, status, response.data)
+        writes = sum(1 for q in queries if q['sql'].startswith(f'UPDATE "{BingoTile._meta.db_table}"'))
+        revision = BingoCard.objects.get(id=self.card.id).tile_revision
+        self.assertEqual((writes, revision), (expected_writes, expected_revision))
+
+        if status == 200:
+            for i, text in changes.items():
+                self.tiles[i]['text'] = text
+        self.assertEqual(list(self.card.tiles.order_by('id').values('id', 'text')), self.tiles)
+
+    def test_edits(self):
+        with self.subTest('nothing changed'):
+            self.edit({}, 0, 0)
+        with self.subTest('one tile'):
+            self.edit({3: 'changed'}, TILE_WRITES, 1)
+        with self.subTest('three tiles'):
+            self.edit({0: 'a', 12: 'b', 24: 'c'}, TILE_WRITES, 2)
+        with self.subTest('same text again'):
+            self.edit({0: 'a'}, 0, 2)
+        with self.subTest('some tiles sent'):
+            self.edit({5: 'partial'}, TILE_WRITES, 3,
+                      data={'tiles': [{'id': self.tiles[5]['id'], 'text': 'partial'}]})
+        with self.subTest('no tiles sent'):
+            self.edit({}, 0, 3, data={'name': 'ignored'})
+
+    def test_tile_of_another_card(self):
+        foreign = self.other.tiles.first()
+        self.edit({}, 0, 0, status=400, data={'tiles': [{'id': foreign.id, 'text': 'stolen'}]})
+        self.assertNotEqual(BingoTile.objects.get(id=foreign.id).text, 'stolen')
+
+    def test_not_the_author(self):
+        self.client.force_authenticate(site_user('stranger').auth_user)
+        self.edit({1: 'stranger'}, 0, 0, status=403)
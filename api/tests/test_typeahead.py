@@ -0,0 +1,74 @@
+import random
+import threading
+import time
+from django.test import SimpleTestCase
+from api.typeahead import PrefixIndex, words
+
+vocabulary = ['anime', 'animal', 'an', 'garnt', 'gigguk', 'joey', 'tourney', 'tour', 'trash', 'taste']
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.random = random.Random(1)
+        self.entries = {}
+        self.index = PrefixIndex(lambda: [], rebuild_interval=3600)
+
+    def random_name(self) -> str:
+        return ' '.join(self.random.choice(vocabulary) for _ in range(self.random.randint(1, 3)))
+
+    def brute_force(self, query: str, limit: int):
+        query_words = words(query)
+        matches = [
+            entry_id for entry_id, (name, _) in self.entries.items()
+            if all(any(w.startswith(q) for w in words(name)) for q in query_words)
+        ]
+        matches.sort(key=lambda i: (self.entries[i][1], -i), reverse=True)
+        return [(i, self.entries[i][0]) for i in matches[:limit]]
+
+    def assert_matches_brute_force(self):
+        queries = ['', 'a', 'an', 'ani', 'anim', 't', 'to', 'tou', 'tourney', 'g', 'x', 'an tour', 'garnt joey']
+        for query in queries:
+            for limit in [1, 3, 12]:
+                self.assertEqual(self.index.search(query, limit), self.brute_force(query, limit), (query, limit))
+
+    def test_add_and_remove_match_brute_force(self):
+        for entry_id in range(1, 40):
+            self.entries[entry_id] = (self.random_name(), self.random.randint(0, 5))
+        self.index.build((i, name, rank) for i, (name, rank) in self.entries.items())
+        self.assert_matches_brute_force()
+
+        next_id = 40
+        for _ in range(300):
+            if self.entries and self.random.random() < 0.5:
+                entry_id = self.random.choice(list(self.entries))
+                del self.entries[entry_id]
+                self.index.remove(entry_id)
+            else:
+                if self.entries and self.random.random() < 0.2:
+                    entry_id = self.random.choice(list(self.entries))  # renamed or reranked
+                else:
+                    entry_id, next_id = next_id, next_id + 1
+                self.entries[entry_id] = (self.random_name(), self.random.randint(0, 5))
+                self.index.add(entry_id, *self.entries[entry_id])
+            self.assert_matches_brute_force()
+
+    def test_first_build_runs_in_background(self):
+        loading = threading.Event()
+        loads = []
+
+        def load():
+            loads.append(1)
+            loading.wait()
+            return [(1, 'anime', 1)]
+
+        index = PrefixIndex(load, rebuild_interval=3600)
+
+        self.assertIsNone(index.search('ani'))
+        self.assertIsNone(index.search('ani'))
+        loading.set()
+
+        deadline = time.monotonic() + 5
+        while index.search('ani') is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(index.search('ani'), [(1, 'anime')])
+        self.assertEqual(len(loads), 1)
@@ -0,0 +1,69 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.models import BingoCardCategory
+from api.testing import post_card, site_user
+
+
+@override_settings(VOTE_BUFFER=False)
+class ViewerStateTests(TestCase):
+    def setUp(self):
+        self.alice = site_user('alice')
+        self.bob = site_user('bob')
+        self.carol = site_user('carol')
+        BingoCardCategory.objects.create(name='memes', author=self.alice)
+        BingoCardCategory.objects.create(name='anime', author=self.alice)
+
+        self.alice_client = self.client_for(self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cards = [post_card(self.alice_client, f'card {i}', 'memes') for i in range(3)]
+        self.categories = list(BingoCardCategory.objects.order_by('name'))  # anime, memes
+
+        # bob's state
+        bob = self.client_for(self.bob)
+        self.act(bob, '/api/votes/', {'card': {'id': self.cards[0].id}, 'up': True})
+        self.act(bob, '/api/votes/', {'card': {'id': self.cards[1].id}, 'up': False})
+        self.act(bob, '/api/subscribe/', {'id': self.categories[1].id})
+        self.act(bob, '/api/follow/', {'id': self.alice.id})
+
+        # carol's, which bob must not see
+        carol = self.client_for(self.carol)
+        self.act(carol, '/api/votes/', {'card': {'id': self.cards[2].id}, 'up': True})
+        self.act(carol, '/api/subscribe/', {'id': self.categories[0].id})
+        self.act(carol, '/api/follow/', {'id': self.bob.id})
+
+    def client_for(self, user) -> APIClient:
+        client = APIClient()
+        client.force_authenticate(user.auth_user)
+        return client
+
+    def act(self, client: APIClient, url: str, data: dict):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def ids(self) -> dict:
+        return {
+            'cards': [card.id for card in self.cards],
+            'categories': [category.id for category in self.categories],
+            'users': [self.alice.id, self.bob.id, self.carol.id],
+        }
+
+    def test_logged_out_gets_empty_state(self):
+        response = APIClient().post('/api/viewer/', self.ids(), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'cards': {}, 'categories': {}, 'users': {}})
+
+    def test_only_the_requesters_state(self):
+        response = self.client_for(self.bob).post('/api/viewer/', self.ids(), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'cards': {str(self.cards[0].id): True, str(self.cards[1].id): False, str(self.cards[2].id): None},
+            'categories': {str(self.categories[0].id): False, str(self.categories[1].id): True},
+            'users': {str(self.alice.id): True, str(self.bob.id): False, str(self.carol.id): False},
+        })
+
+    def test_too_many_ids(self):
+        for kind in ['cards', 'categories', 'users']:
+            response = self.client_for(self.bob).post('/api/viewer/', {kind: list(range(1, 202))}, format='json')
+            self.assertEqual(response.status_code, 400, kind)
+            self.assertIn(kind, response.json())
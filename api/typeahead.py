@@ -0,0 +1,205 @@
+'''
+Per-worker prefix indexes for the search bar endpoints.
+
+Every word of a name is indexed, so "ani" finds "big #anime fan". Entries
+are ranked (categories by card count, cards by best) and the top results for
+each word prefix are kept precomputed, so single word queries skip the scan.
+Creates and deletes in this worker are applied as they happen, other
+workers' changes show up at the next full rebuild. Builds run in a
+background thread, and searches get None until the first one is done.
+'''
+
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db import close_old_connections
+from .models import BingoCard, BingoCardCategory
+
+Row = Tuple[int, str, float]  # id, name, rank
+
+
+def words(name: str) -> List[str]:
+    return re.findall(r'\w+', name.lower())
+
+
+class PrefixIndex:
+    # prefixes up to this length get their top entries precomputed
+    cached_prefix_length = 8
+    # kept longer than what's asked for so deletes don't empty them out
+    cached_top = 10
+
+    def __init__(self, load: Callable[[], Iterable[Row]], rebuild_interval: float):
+        self.load = load
+        self.rebuild_interval = rebuild_interval
+
+        self._words: List[Tuple[str, int]] = []  # sorted (word, id)
+        self._entries: Dict[int, Tuple[float, str]] = {}  # id -> (rank, name)
+        self._top: Dict[str, List[int]] = {}  # short prefix -> ids, best first
+        self._built_at = None
+        self._lock = threading.RLock()
+        self._rebuilding = False
+
+    def search(self, query: str, limit: int = 3) -> Optional[List[Tuple[int, str]]]:
+        '''
+        Returns (id, name) of the best ranked entries matching `query`, or
+        None while the index is being built for the first time.
+        '''
+
+        if not self._ensure_fresh():
+            return None
+        query_words = words(query)
+
+        with self._lock:
+            if len(query_words) <= 1 and limit <= self.cached_top:
+                ids = self._top.get(query_words[0] if query_words else '')
+                if ids is not None:
+                    return [(i, self._entries[i][1]) for i in ids[:limit]]
+
+            # intersect the id ranges of each word, narrowest first
+            candidates = None
+            for prefix in sorted(set(query_words), key=len, reverse=True):
+                matches = self._prefix_ids(prefix)
+                candidates = matches if candidates is None else candidates & matches
+                if not candidates:
+                    return []
+
+            if candidates is None:
+                candidates = self._entries.keys()
+            ids = heapq.nlargest(limit, candidates, key=self._sort_key)
+            return [(i, self._entries[i][1]) for i in ids]
+
+    def build(self, rows: Iterable[Row]):
+        entries = {}
+        index_words = []
+        top = {}
+
+        for entry_id, name, rank in rows:
+            entries[entry_id] = (rank, name)
+            entry_words = words(name)
+            index_words.extend((w, entry_id) for w in entry_words)
+
+            for prefix in self._short_prefixes(entry_words):
+                heap = top.setdefault(prefix, [])
+                item = ((rank, -entry_id), entry_id)
+                if len(heap) < self.cached_top:
+                    heapq.heappush(heap, item)
+                else:
+                    heapq.heappushpop(heap, item)
+
+        index_words.sort()
+        top = {prefix: [i for _, i in sorted(heap, reverse=True)] for prefix, heap in top.items()}
+
+        with self._lock:
+            self._words, self._entries, self._top = index_words, entries, top
+            self._built_at = time.monotonic()
+
+    def add(self, entry_id: int, name: str, rank: float):
+        with self._lock:
+            if self._built_at is None:
+                return
+            if entry_id in self._entries:
+                self.remove(entry_id)
+
+            self._entries[entry_id] = (rank, name)
+            entry_words = words(name)
+            for w in entry_words:
+                insort(self._words, (w, entry_id))
+
+            for prefix in self._short_prefixes(entry_words):
+                ids = self._top.get(prefix)
+                if ids is None:
+                    if self._shared(prefix, entry_id):
+                        continue  # dropped after deletes, left to scanning
+                    ids = self._top[prefix] = []
+                ids.append(entry_id)
+                ids.sort(key=self._sort_key, reverse=True)
+                del ids[self.cached_top:]
+
+    def remove(self, entry_id: int):
+        with self._lock:
+            if entry_id not in self._entries:
+                return
+
+            _, name = self._entries.pop(entry_id)
+            entry_words = words(name)
+            for w in entry_words:
+                i = bisect_left(self._words, (w, entry_id))
+                if i < len(self._words) and self._words[i] == (w, entry_id):
+                    del self._words[i]
+
+            for prefix in self._short_prefixes(entry_words):
+                ids = self._top.get(prefix)
+                if ids is None or entry_id not in ids:
+                    continue
+                ids.remove(entry_id)
+                if len(ids) < self.cached_top:
+                    # may be missing entries now, fall back to scanning
+                    del self._top[prefix]
+
+    def _prefix_ids(self, prefix: str) -> set:
+        start = bisect_left(self._words, (prefix, 0))
+        # first word sorting after every word starting with prefix
+        end = bisect_left(self._words, (prefix[:-1] + chr(ord(prefix[-1]) + 1), 0), start)
+        return {i for _, i in self._words[start:end]}
+
+    def _shared(self, prefix: str, entry_id: int) -> bool:
+        '''Whether words of entries other than `entry_id` start with `prefix`.'''
+        i = bisect_left(self._words, (prefix, 0))
+        while i < len(self._words) and self._words[i][0].startswith(prefix):
+            if self._words[i][1] != entry_id:
+                return True
+            i += 1
+        return False
+
+    def _sort_key(self, entry_id: int):
+        return self._entries[entry_id][0], -entry_id
+
+    def _short_prefixes(self, entry_words: List[str]):
+        return {''} | {
+            w[:length]
+            for w in entry_words
+            for length in range(1, min(len(w), self.cached_prefix_length) + 1)
+        }
+
+    def _ensure_fresh(self) -> bool:
+        '''
+        Starts a build when there's no index yet or it's due for a rebuild.
+        Returns whether there's an index to search.
+        '''
+
+        built_at = self._built_at
+        if built_at is not None and time.monotonic() - built_at < self.rebuild_interval:
+            return True
+
+        with self._lock:
+            # keep serving the old index, if any, while the new one loads
+            if not self._rebuilding:
+                self._rebuilding = True
+                threading.Thread(target=self._rebuild, name='typeahead-rebuild', daemon=True).start()
+            return self._built_at is not None
+
+    def _rebuild(self):
+        try:
+            self.build(self.load())
+        except Exception as err:
+            print(f'typeahead rebuild failed: {err}')
+        finally:
+            with self._lock:
+                self._rebuilding = False
+            close_old_connections()
+
+
+def load_categories():
+    return BingoCardCategory.objects.order_by().values_list('id', 'name', 'card_count').iterator()
+
+
+def load_cards():
+    return BingoCard.objects.order_by().values_list('id', 'name', 'best').iterator()
+
+
+category_index = PrefixIndex(load_categories, settings.TYPEAHEAD_REBUILD_INTERVAL)
+card_index = PrefixIndex(load_cards, settings.TYPEAHEAD_REBUILD_INTERVAL)
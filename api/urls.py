@@ -26,13 +26,16 @@ urlpatterns = [
     path("api/bar/cards/", views.CardSearchList.as_view()),
     path("api/categories/", views.CategoryList.as_view()),
     path("api/categories/<str:name>/", views.CategoryDetail.as_view()),
+    path("api/categories/<str:name>/generate/", views.generate_card_view),
     path("api/cards/", views.CardList.as_view()),
     path("api/cards/<int:pk>/", views.CardDetail.as_view()),
     path("api/users/<int:pk>/", views.UserDetail.as_view()),
     path("api/votes/", views.upvote_view),
+    path("api/results/", views.result_view),
     path("api/signup/", views.create_user_view),
     path("api/subscribe/", views.sub_category_view),
     path("api/follow/", views.follow_user_view),
+    path("api/viewer/", views.viewer_state_view),
     path("api/home/", views.HomePageList.as_view()),
     path("api/popular/categories/", views.PopularCategoryList.as_view()),
     ##########################
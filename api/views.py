@@ -1,9 +1,10 @@
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_protect
 from django.db.transaction import atomic
-from django.db.models import QuerySet
+from django.db.models import Count, Q, QuerySet
 from rest_framework import generics  # , filters #, mixins
 from rest_framework import permissions
 from rest_framework import status
@@ -11,7 +12,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.request import Request
 
-from .models import BingoCard, BingoCardCategory, SiteUser
+from .models import BingoCard, BingoCardCategory, RelatedCategory, SiteUser
+from .caching import CachedResponseMixin, ConditionalGetMixin, category_scope
+from .dedup import result_filters, result_key, session_id
+from .feeds import feed_store, home_streams
+from .generator import card_generator
+from .typeahead import card_index, category_index
 from .serializers import (
     CardDetailSerializer,
     VoteSerializer,
@@ -28,23 +34,44 @@ from .serializers import (
     UserFollowSerializer,
     CategorySubscribeSerializer,
     CategoryRelatedSerializer,
+    GenerateCardSerializer,
+    ResultSerializer,
+    ViewerStateSerializer,
+    viewer_state,
+    CardRowSerializer,
+    CardSearchBarRowSerializer,
+    CategorySearchBarRowSerializer,
 )
 
 from .filters import (
     Pagination,
-    SearchFilter,
+    KeysetPagination,
+    MergedPagination,
+    CardSearchFilter,
+    CategorySearchFilter,
+    CardOrderingFilter,
     OrderingFilter,
     CardCategoryFilter,
     CardAuthorFilter,
-    DateFilter,
+    LeaderboardFilter,
     TopThreeCategoryFilter,
     TopThreeCardFilter,
     CardHashtagFilter,
     top_n_categories,
+    CachedCount,
+    EstimatedCount,
 )
 
 HOME_SORT = "-hot"
 
+# everything the card and category serializers read per row
+CARD_LIST_QUERYSET = BingoCard.objects.select_related("author", "category").prefetch_related(
+    "hashtags"
+)
+CATEGORY_QUERYSET = BingoCardCategory.objects.select_related("author").prefetch_related(
+    "hashtags", "author__categories_created"
+)
+
 ##############################################################################
 
 
@@ -55,35 +82,81 @@ def index(request, *_, **__):
 ##############################################################################
 
 
-class UserDetail(generics.RetrieveAPIView):
+class RowListMixin:
+    """
+    Lists with `row_serializer_class` from values() rows instead of model
+    instances when settings.ROW_SERIALIZERS is on. The sort column is
+    selected too, for pagination cursors.
+    """
+
+    row_serializer_class = None
+
+    def list(self, request: Request, *args, **kwargs):
+        if not settings.ROW_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = list(self.row_serializer_class.columns)
+        if self.paginator is not None:
+            ordering = (queryset.query.order_by or queryset.model._meta.ordering)[0].lstrip("-")
+            columns += [ordering] if ordering not in columns else []
+
+        # related rows come from the row serializer's own lookups
+        rows = queryset.prefetch_related(None).values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.row_serializer_class(rows, many=True).data)
+
+        return self.get_paginated_response(self.row_serializer_class(page, many=True).data)
+
+
+class UserDetail(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Gets a single site user.
     """
 
-    queryset = SiteUser.objects.all()
+    queryset = SiteUser.objects.prefetch_related("categories_created")
     serializer_class = UserDetailSerializer
 
+    def get_version(self, request: Request):
+        pk = self.kwargs["pk"]
+        user = SiteUser.objects.filter(pk=pk).values_list("name", "score").first()
+        if user is None:
+            return None
+
+        categories = list(
+            BingoCardCategory.objects.filter(author_id=pk)
+            .order_by("id")
+            .values_list("id", "subscriber_count", "icon_url")
+        )
+
+        return (user, categories), None
 
-class CardList(generics.ListCreateAPIView):
+
+class CardList(CachedResponseMixin, RowListMixin, generics.ListCreateAPIView):
 
     """
     Gets a list of cards, or creates a single new card.
     """
 
-    queryset = BingoCard.objects.all()
+    queryset = CARD_LIST_QUERYSET
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     serializer_class = CardListSerializer
-    pagination_class = Pagination
+    row_serializer_class = CardRowSerializer
+    cache_scopes = ["cards"]
+    pagination_class = KeysetPagination
+    count_strategy = CachedCount(ttl=30)
     filter_backends = [
-        DateFilter,
-        SearchFilter,
+        LeaderboardFilter,
+        CardSearchFilter,
         CardCategoryFilter,
         CardAuthorFilter,
         CardHashtagFilter,
-        OrderingFilter,
+        CardOrderingFilter,
     ]
     search_fields = ["name"]
-    ordering_fields = ["best", "hot", "created_at", "score"]
+    ordering_fields = ["best", "hot", "created_at", "score", "relevance"]
+    # searches default to -relevance, see CardOrderingFilter
     ordering = ["-created_at"]
 
     # def perform_create(self, serializer):
@@ -113,16 +186,28 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
         return obj.author == site_user
 
 
-class CardDetail(generics.RetrieveUpdateDestroyAPIView):
+class CardDetail(ConditionalGetMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
 
     """
     Get, delete or update a single bingo card.
     """
 
-    queryset = BingoCard.objects.all()
+    queryset = CARD_LIST_QUERYSET.prefetch_related("tiles")
     serializer_class = CardDetailSerializer
+    cache_scopes = ["card:{pk}"]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
 
+    def get_version(self, request: Request):
+        card = (
+            BingoCard.objects.filter(pk=self.kwargs["pk"])
+            .values_list("edited_at", "score", "ups", "votes_total", "tile_revision")
+            .first()
+        )
+        if card is None:
+            return None
+
+        return card, card[0]
+
     def put(self, request: Request, *args, **kwargs):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
@@ -169,7 +254,7 @@ class CardDetail(generics.RetrieveUpdateDestroyAPIView):
     #    return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class PopularCategoryList(generics.ListAPIView):
+class PopularCategoryList(CachedResponseMixin, generics.ListAPIView):
 
     """
     Shows bingo card categories.
@@ -177,6 +262,7 @@ class PopularCategoryList(generics.ListAPIView):
 
     queryset = BingoCardCategory.objects.all()
     serializer_class = CategoryRelatedSerializer
+    cache_scopes = ["categories"]
     pagination_class = Pagination
     ordering_fields = ["score", "created_at"]
     ordering = ["-created_at"]
@@ -189,21 +275,23 @@ class CategoryList(generics.ListAPIView):
     Shows bingo card categories.
     """
 
-    queryset = BingoCardCategory.objects.all()
+    queryset = CATEGORY_QUERYSET
     serializer_class = CategorySerializer
     pagination_class = Pagination
+    count_strategy = EstimatedCount()
     ordering_fields = ["score", "created_at"]
     ordering = ["-created_at"]
 
 
-class CategoryDetail(generics.RetrieveAPIView):
+class CategoryDetail(ConditionalGetMixin, CachedResponseMixin, generics.RetrieveAPIView):
 
     """
     Get a single bingo card category.
     """
 
-    queryset = BingoCardCategory.objects.all()
+    queryset = CATEGORY_QUERYSET
     serializer_class = CategorySerializer
+    cache_scopes = ["categories"]
     lookup_field = "name"
     db_lookup_field = "name__iexact"
 
@@ -213,41 +301,113 @@ class CategoryDetail(generics.RetrieveAPIView):
         filter = {self.db_lookup_field: self.kwargs[self.lookup_field]}
         return get_object_or_404(queryset, **filter)  # Lookup the object
 
+    def get_cache_scopes(self, kwargs):
+        # the author's score is bumped per category, see bump_author_categories
+        return super().get_cache_scopes(kwargs) + [category_scope(kwargs[self.lookup_field])]
+
+    def get_version(self, request: Request):
+        filter = {self.db_lookup_field: self.kwargs[self.lookup_field]}
+        category = (
+            BingoCardCategory.objects.filter(**filter)
+            # hashtags are only added or deleted, so their count is enough
+            .annotate(hashtag_count=Count("hashtags"))
+            .values_list(
+                "id",
+                "name",
+                "subscriber_count",
+                "card_count",
+                "description",
+                "icon_url",
+                "banner_url",
+                "author_id",
+                "author__name",
+                "author__score",
+                "hashtag_count",
+            )
+            .first()
+        )
+        if category is None:
+            return None
+
+        # the author's categories, as in UserDetail.get_version
+        author_categories = list(
+            BingoCardCategory.objects.filter(author_id=category[7])
+            .order_by("id")
+            .values_list("id", "subscriber_count", "icon_url")
+        )
+        # everything get_related_categories picks from
+        related = list(
+            RelatedCategory.objects.filter(category_id=category[0])
+            .order_by("-shared", "related_id")
+            .values_list(
+                "related_id",
+                "shared",
+                "related__name",
+                "related__icon_url",
+                "related__subscriber_count",
+            )[:10]
+        )
+
+        return (category, author_categories, related), None
+
 
-class CardSearchList(generics.ListAPIView):
+class CardSearchList(RowListMixin, generics.ListAPIView):
     """
     View for category search bar. Returns top 3 categories sorted by number of bingo cards.
     """
 
     queryset = BingoCard.objects.all()
     serializer_class = CardSearchBarSerializer
+    row_serializer_class = CardSearchBarRowSerializer
     filter_backends = [
-        SearchFilter,
+        CardSearchFilter,
         TopThreeCardFilter,
     ]
     search_fields = ["name"]
 
+    def list(self, request, *args, **kwargs):
+        if not settings.TYPEAHEAD_INDEX:
+            return super().list(request, *args, **kwargs)
 
-class CategorySearchList(generics.ListAPIView):
+        results = card_index.search(request.query_params.get("search", ""))
+        if results is None:
+            # the index is still loading
+            return super().list(request, *args, **kwargs)
+        return Response([{"name": name, "id": card_id} for card_id, name in results])
+
+
+class CategorySearchList(RowListMixin, generics.ListAPIView):
     """
     View for category search bar. Returns top 3 categories sorted by number of bingo cards.
     """
 
     queryset = BingoCardCategory.objects.all()
     serializer_class = CategorySearchBarSerializer
+    row_serializer_class = CategorySearchBarRowSerializer
     filter_backends = [
-        SearchFilter,
+        CategorySearchFilter,
         TopThreeCategoryFilter,
     ]
     search_fields = ["name"]
 
+    def list(self, request, *args, **kwargs):
+        if not settings.TYPEAHEAD_INDEX:
+            return super().list(request, *args, **kwargs)
+
+        results = category_index.search(request.query_params.get("search", ""))
+        if results is None:
+            return super().list(request, *args, **kwargs)
+        return Response([{"name": name} for _, name in results])
+
 
 ##############################################################################
 
 
-class HomePageList(generics.ListAPIView):
+class HomePageList(RowListMixin, generics.ListAPIView):
     serializer_class = CardListSerializer
-    pagination_class = Pagination
+    row_serializer_class = CardRowSerializer
+    pagination_class = MergedPagination
+    count_strategy = CachedCount(ttl=30)
     filter_backends = [
         OrderingFilter,
     ]
@@ -258,32 +418,101 @@ class HomePageList(generics.ListAPIView):
     def get_queryset(self):
         user: SiteUser = self.request.user.site_user
 
-        # follow_ids: QuerySet = user.following.values_list('cards_created', flat=True)
-        subscription_ids: QuerySet = user.subscriptions.values_list("cards", flat=True)
-
-        home_page_cards: QuerySet = BingoCard.objects.filter(id__in=subscription_ids)
+        home_page_cards: QuerySet = CARD_LIST_QUERYSET.filter(
+            Q(id__in=feed_store.card_ids(user.id)) | Q(author__in=user.following.all())
+        )
 
         return home_page_cards
 
+    def get_streams(self, ordering: str, position, limit: int):
+        return home_streams(self.request.user.site_user.id, ordering, position, limit)
+
+
+@csrf_protect
+@api_view(["POST"])
+def viewer_state_view(request):
+    """
+    The requester's votes, subscriptions and follows for lists of card,
+    category and user ids, which the public payloads leave out. Logged out
+    requests get empty state.
+    """
+    serializer = ViewerStateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        site_user = request.user.site_user
+    except AttributeError:
+        return Response({"cards": {}, "categories": {}, "users": {}})
+
+    return Response(viewer_state(site_user, **serializer.validated_data))
 
-# @api_view()
-# @permission_classes([permissions.IsAuthenticated])
-# def home_page_view(request: Request):
-#    user: SiteUser = request.user.site_user
-#
-#    follow_ids: QuerySet = user.following.values_list('followee_id', flat=True)
-#    follow_cards: QuerySet = BingoCard.objects.filter(author_id__in=follow_ids)
-#
-#    subscription_ids: QuerySet = user.subscriptions.values_list('category_id', flat=True)
-#    subscription_cards: QuerySet = BingoCard.objects.filter(category_id__in=subscription_ids)
-#
-#    home_page_cards = subscription_cards.union(follow_cards).order_by(HOME_SORT)
-#
-#    paginator = Pagination()
-#    results = paginator.paginate_queryset(home_page_cards, request)
-#    serializer = CardListSerializer(results, many=True, context={'request': request})
-#
-#    return paginator.get_paginated_response(serializer.data)
+
+@api_view()
+def generate_card_view(request, name: str):
+    """
+    A random card drawn from the category's tile pool. Passing the `seed` of
+    a generated card gives the same card again, as long as the pool's tiles
+    and their scores haven't changed.
+    """
+    serializer = GenerateCardSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        card = card_generator.generate(name, serializer.validated_data.get("seed"))
+    except ValueError as err:
+        return Response({"detail": str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if card is None:
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(card)
+
+
+@csrf_protect
+@api_view(["POST"])
+def result_view(request):
+    """
+    Records a completed card. Logged out visitors can play too, and only the
+    first result per user or session for a card counts.
+    """
+    serializer = ResultSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    session = result_session(request)
+    data = serializer.validated_data
+    # a generated card's category and seed are covered by its signature
+    key = result_key(session, data.get("card"), data["category_id"], data.get("seed"))
+    if not settings.RESULT_DEDUP:
+        serializer.save(user=getattr(request.user, "site_user", None), session=session)
+        return Response(status=status.HTTP_201_CREATED)
+
+    # held while saving, so copies sent at the same time get turned away
+    if not result_filters.reserve(key):
+        return Response(
+            {"detail": "Only the first result for a card is counted."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    try:
+        serializer.save(user=getattr(request.user, "site_user", None), session=session)
+    except BaseException:
+        # a result that failed to save can be sent again
+        result_filters.release(key)
+        raise
+    result_filters.record(key)
+    return Response(status=status.HTTP_201_CREATED)
+
+
+def result_session(request: Request) -> str:
+    if request.user.is_authenticated:
+        return f"user:{request.user.id}"
+
+    if not request.session.session_key:
+        # give the visitor a session, the cookie goes out with this response
+        request.session.save()
+        request.session.modified = True
+    return session_id(request.session.session_key)
 
 
 @csrf_protect
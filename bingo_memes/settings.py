@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 ]
 
 MIDDLEWARE = [
@@ -146,11 +147,138 @@ SESSION_COOKIE_HTTPONLY = True
 # CSRF_COOKIE_SECURE = True
 # SESSION_COOKIE_SECURE = True
 
-DEFAULT_RENDERER_CLASSES = ("rest_framework.renderers.JSONRenderer",)
+# Vote scoring
+# With VOTE_BUFFER on, card and author scores are written in batches by a
+# background thread instead of inside each vote request. Scores lag behind
+# the votes by at most VOTE_BUFFER_INTERVAL milliseconds.
+
+VOTE_BUFFER = config("VOTE_BUFFER", default=False, cast=bool)
+VOTE_BUFFER_INTERVAL = config("VOTE_BUFFER_INTERVAL", default=500, cast=int)
+VOTE_BUFFER_MAX_PENDING = config("VOTE_BUFFER_MAX_PENDING", default=1000, cast=int)
+
+# Search bar
+# With TYPEAHEAD_INDEX on, the search bar endpoints answer from an in-memory
+# prefix index in each worker, rebuilt every TYPEAHEAD_REBUILD_INTERVAL seconds.
+
+TYPEAHEAD_INDEX = config("TYPEAHEAD_INDEX", default=True, cast=bool)
+TYPEAHEAD_REBUILD_INTERVAL = config("TYPEAHEAD_REBUILD_INTERVAL", default=300, cast=int)
+
+# Hashtags
+# Each worker keeps the ids of up to HASHTAG_CACHE_SIZE hashtags, so creating
+# and filtering cards doesn't have to look them up. 0 turns it off.
+
+HASHTAG_CACHE_SIZE = config("HASHTAG_CACHE_SIZE", default=10000, cast=int)
+
+# Generated cards
+# The lobby game mode draws cards from a category's tile pool (see
+# api/generator.py). Each worker reloads a pool at least every
+# CARD_GENERATOR_POOL_TTL seconds.
+
+CARD_GENERATOR_POOL_TTL = config("CARD_GENERATOR_POOL_TTL", default=300, cast=int)
+
+# Bingo results
+# Each result adds to its tiles' hit and exposure counters, split over
+# TILE_COUNTER_SHARDS rows per tile. With RESULT_BUFFER on, results are saved
+# in batches by a background thread, at most RESULT_BUFFER_INTERVAL
+# milliseconds after they come in. refresh_tile_scores (run it on a schedule)
+# turns the counters into tile scores.
+
+TILE_COUNTER_SHARDS = config("TILE_COUNTER_SHARDS", default=16, cast=int)
+RESULT_BUFFER = config("RESULT_BUFFER", default=True, cast=bool)
+RESULT_BUFFER_INTERVAL = config("RESULT_BUFFER_INTERVAL", default=1000, cast=int)
+RESULT_BUFFER_MAX_PENDING = config("RESULT_BUFFER_MAX_PENDING", default=5000, cast=int)
+
+# Only the first result of a card per session counts. RESULT_DEDUP checks that
+# against in-memory Bloom filters (see api/dedup.py): one per
+# RESULT_DEDUP_BUCKET seconds, remembered for RESULT_DEDUP_WINDOW buckets, each
+# sized for RESULT_DEDUP_CAPACITY results, with at most RESULT_DEDUP_ERROR_RATE
+# of first results wrongly turned away. Workers share them every
+# RESULT_DEDUP_PERSIST_INTERVAL seconds through the database.
+
+RESULT_DEDUP = config("RESULT_DEDUP", default=True, cast=bool)
+RESULT_DEDUP_BUCKET = config("RESULT_DEDUP_BUCKET", default=3600, cast=int)
+RESULT_DEDUP_WINDOW = config("RESULT_DEDUP_WINDOW", default=24, cast=int)
+RESULT_DEDUP_CAPACITY = config("RESULT_DEDUP_CAPACITY", default=100000, cast=int)
+RESULT_DEDUP_ERROR_RATE = config("RESULT_DEDUP_ERROR_RATE", default=0.001, cast=float)
+RESULT_DEDUP_PERSIST_INTERVAL = config("RESULT_DEDUP_PERSIST_INTERVAL", default=30, cast=int)
+
+# Home feed
+# New cards are pushed to the feeds of their category's subscribers, which
+# keep the newest HOME_FEED_LENGTH cards. api.feeds.LocalFeedStore keeps the
+# feeds in each worker's memory instead of the database.
+
+HOME_FEED_BACKEND = config("HOME_FEED_BACKEND", default="api.feeds.DatabaseFeedStore")
+HOME_FEED_LENGTH = config("HOME_FEED_LENGTH", default=500, cast=int)
+
+# Leaderboards
+# refresh_leaderboards (run it on a schedule) stores the top LEADERBOARD_SIZE
+# cards of every ?from= window. Boards older than LEADERBOARD_MAX_AGE seconds
+# are ignored in favor of the live query.
+
+LEADERBOARD_SIZE = config("LEADERBOARD_SIZE", default=1000, cast=int)
+LEADERBOARD_MAX_AGE = config("LEADERBOARD_MAX_AGE", default=900, cast=int)
+
+# Response cache
+# GETs of the card and category endpoints are cached for up to
+# RESPONSE_CACHE_TTL seconds, and dropped sooner when signals see the data
+# change. Signals drop entries by incrementing version keys, so every worker
+# has to see the same cache: set RESPONSE_CACHE_BACKEND to a shared backend
+# with an atomic incr, like Redis or Memcached, and RESPONSE_CACHE_LOCATION
+# to its address. The cache stays off with the default per-process backend
+# unless RESPONSE_CACHE turns it on, which is only safe with one worker.
+
+LOCAL_CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+RESPONSE_CACHE_BACKEND = config("RESPONSE_CACHE_BACKEND", default=LOCAL_CACHE_BACKEND)
+RESPONSE_CACHE = config(
+    "RESPONSE_CACHE",
+    default=RESPONSE_CACHE_BACKEND != LOCAL_CACHE_BACKEND,
+    cast=bool,
+)
+RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", default=60, cast=int)
+
+CACHES = {
+    "default": {
+        "BACKEND": LOCAL_CACHE_BACKEND,
+    },
+    "responses": {
+        "BACKEND": RESPONSE_CACHE_BACKEND,
+        "LOCATION": config("RESPONSE_CACHE_LOCATION", default="responses"),
+        # Redis and Memcached clients reject options they don't know
+        "OPTIONS": {"MAX_ENTRIES": 10000} if RESPONSE_CACHE_BACKEND == LOCAL_CACHE_BACKEND else {},
+    },
+}
+
+# List serializers
+# ROW_SERIALIZERS builds card list, home feed and search bar responses from
+# values() rows instead of model instances. Same output, less time and memory.
+
+ROW_SERIALIZERS = config("ROW_SERIALIZERS", default=True, cast=bool)
+
+# JSON
+# FAST_JSON renders and parses API requests with orjson (see api/renderers.py),
+# writing the same bytes as the stock classes. orjson comes with the fast-json
+# extra (poetry install -E fast-json). Without it, or with FAST_JSON off, the
+# stock rest_framework classes are used.
+
+FAST_JSON = config("FAST_JSON", default=True, cast=bool)
+
+if FAST_JSON:
+    JSON_RENDERER, JSON_PARSER = "api.renderers.FastJSONRenderer", "api.renderers.FastJSONParser"
+else:
+    JSON_RENDERER, JSON_PARSER = "rest_framework.renderers.JSONRenderer", "rest_framework.parsers.JSONParser"
+
+DEFAULT_RENDERER_CLASSES = (JSON_RENDERER,)
 
 if DEBUG:
     DEFAULT_RENDERER_CLASSES = DEFAULT_RENDERER_CLASSES + (
         "rest_framework.renderers.BrowsableAPIRenderer",
     )
 
-REST_FRAMEWORK = {"DEFAULT_RENDERER_CLASSES": DEFAULT_RENDERER_CLASSES}
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": DEFAULT_RENDERER_CLASSES,
+    "DEFAULT_PARSER_CLASSES": (
+        JSON_PARSER,
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+}
@@ -2,7 +2,7 @@ import Cookies from "universal-cookie";
 import { Location } from "history";
 
 import { toApiQuery } from "../components/pagination";
-import { User, BingoCard, Category } from "../types";
+import { User, BingoCard, Category, GeneratedCard, SearchResults } from "../types";
 import debugLog from "../debug";
 
 // here for pasting purposes
@@ -50,20 +50,107 @@ const apiDelete = async <T = any>(url: string): Promise<ApiResponse<T>> => {
     });
 };
 
+// last GET response of each url that came with an ETag, reused when the
+// server answers 304 Not Modified
+const etagCache = new Map<string, { etag: string; data: any }>();
+const etagCacheSize = 200;
+
 const apiResp = async <T = any>(url: string, options: any): Promise<ApiResponse<T>> => {
+    const isGet = (options.method || "GET") === "GET";
+    const cached = isGet ? etagCache.get(url) : undefined;
+    if (cached) {
+        options = { ...options, headers: { ...options.headers, "If-None-Match": cached.etag } };
+    }
+
     let resp = await fetch(`${baseUrl}${url}`, options);
+
+    if (resp.status === 304 && cached) {
+        return {
+            data: cached.data,
+            ok: true,
+        };
+    }
+
     let respData: T | null = null;
 
     try {
         respData = await resp.json();
     } catch {}
 
+    if (isGet) {
+        const etag = resp.headers.get("ETag");
+        etagCache.delete(url);
+        if (resp.ok && etag) {
+            etagCache.set(url, { etag, data: respData });
+            if (etagCache.size > etagCacheSize) {
+                // maps iterate in insertion order, so this is the oldest
+                etagCache.delete(etagCache.keys().next().value);
+            }
+        }
+    }
+
     return {
         data: respData,
         ok: resp.ok,
     };
 };
 
+// viewer specific fields are left out of the public payloads, so they can be
+// cached for everyone, and fetched for all objects on a page in one request
+interface ViewerState {
+    cards: { [id: number]: boolean | null };
+    categories: { [id: number]: boolean };
+    users: { [id: number]: boolean };
+}
+
+interface ViewerObjects {
+    cards?: BingoCard[];
+    categories?: Category[];
+    users?: User[];
+}
+
+// whether someone is logged in, as of the last session, login or logout response
+let signedIn: Promise<boolean> | null = null;
+
+const isSignedIn = (): Promise<boolean> => {
+    if (!signedIn) {
+        api.getSession();
+    }
+    return signedIn!;
+};
+
+const withViewerState = async <T = any>(
+    resp: ApiResponse<T>,
+    pick: (data: T) => ViewerObjects
+): Promise<ApiResponse<T>> => {
+    if (!resp.ok || !resp.data) {
+        return resp;
+    }
+
+    // copies, so the objects kept in etagCache stay public
+    const data: T = JSON.parse(JSON.stringify(resp.data));
+    const { cards = [], categories = [], users = [] } = pick(data);
+    if (!cards.length && !categories.length && !users.length) {
+        return { ...resp, data };
+    }
+
+    // logged out visitors have no state to fetch
+    const state = (await isSignedIn())
+        ? await apiGetPostPut<ViewerState>("/viewer/", {
+              cards: cards.map((c) => c.id),
+              categories: categories.map((c) => c.id),
+              users: users.map((u) => u.id),
+          })
+        : null;
+    const { cards: votes = {}, categories: subscribed = {}, users: following = {} } = state?.data || {};
+
+    cards.forEach((c) => (c.upvoted = votes[c.id] ?? null));
+    categories.forEach((c) => (c.is_subscribed = subscribed[c.id] ?? null));
+    users.forEach((u) => (u.is_following = following[u.id] ?? null));
+
+    return { ...resp, data };
+};
+
 interface VoteData {
     card: { id: number };
     up: boolean;
@@ -88,12 +175,31 @@ interface FollowData {
     id: number;
 }
 
+// a posted card, or the category, seed, version, tile ids and signature of a generated one
+interface ResultData {
+    card?: number;
+    category?: string;
+    seed?: number;
+    version?: number;
+    tiles?: number[];
+    signature?: string;
+    mask: number;
+}
+
 const api = {
-    login(credentials: object) {
-        return apiGetPostPut<LoginData>("/login/", credentials);
+    async login(credentials: object) {
+        const resp = await apiGetPostPut<LoginData>("/login/", credentials);
+        if (resp.ok && resp.data?.user) {
+            signedIn = Promise.resolve(true);
+        }
+        return resp;
     },
-    logout() {
-        return apiGetPostPut("/logout/");
+    async logout() {
+        const resp = await apiGetPostPut("/logout/");
+        if (resp.ok) {
+            signedIn = Promise.resolve(false);
+        }
+        return resp;
     },
 
     // PUT
@@ -122,26 +228,50 @@ const api = {
     createCard(cardData: object) {
         return apiGetPostPut("/cards/", cardData);
     },
+    createResult(resultData: ResultData) {
+        return apiGetPostPut("/results/", resultData);
+    },
 
     // GET
     getSession() {
-        return apiGetPostPut("/session/");
+        const resp = apiGetPostPut("/session/");
+        // unknown on errors, the viewer endpoint answers logged out requests too
+        signedIn = resp.then(({ ok, data }) => !ok || !!data?.user);
+        return resp;
     },
-    getCard(cardId: string) {
-        return apiGetPostPut(`/cards/${cardId}/`);
+    async getCard(cardId: string) {
+        return withViewerState(await apiGetPostPut<BingoCard>(`/cards/${cardId}/`), (card) => ({
+            cards: [card],
+        }));
     },
-    getUser(userId: string) {
-        return apiGetPostPut(`/users/${userId}/`);
+    async getUser(userId: string) {
+        return withViewerState(await apiGetPostPut<User>(`/users/${userId}/`), (user) => ({
+            users: [user],
+            categories: user.categories_created,
+        }));
     },
-    getCategory(categoryName: string) {
-        return apiGetPostPut(`/categories/${categoryName}/`);
+    async getCategory(categoryName: string) {
+        return withViewerState(await apiGetPostPut<Category>(`/categories/${categoryName}/`), (category) => ({
+            categories: [category, ...category.related_categories],
+        }));
     },
 
-    getCardList(location: Location, query: object = {}) {
-        return apiGetPostPut(`/cards/?${toApiQuery(location, query)}`);
+    async getCardList(location: Location, query: object = {}) {
+        return withViewerState(
+            await apiGetPostPut<SearchResults<BingoCard>>(`/cards/?${toApiQuery(location, query)}`),
+            (page) => ({ cards: page.results })
+        );
+    },
+    async getHomeCards(location: Location, query: object = {}) {
+        return withViewerState(
+            await apiGetPostPut<SearchResults<BingoCard>>(`/home/?${toApiQuery(location, query)}`),
+            (page) => ({ cards: page.results })
+        );
     },
-    getHomeCards(location: Location, query: object = {}) {
-        return apiGetPostPut(`/home/?${toApiQuery(location, query)}`);
+
+    generateCard(categoryName: string, seed?: number) {
+        const query = seed === undefined ? "" : `?seed=${seed}`;
+        return apiGetPostPut<GeneratedCard>(`/categories/${categoryName}/generate/${query}`);
     },
 
     getTopThreeCards(name: string) {
@@ -151,8 +281,11 @@ const api = {
         return apiGetPostPut<Category[]>(`/bar/categories/?search=${name}`);
     },
 
-    getPopularCategories() {
-        return apiGetPostPut<Category[]>("/popular/categories/");
+    async getPopularCategories() {
+        return withViewerState(
+            await apiGetPostPut<SearchResults<Category>>("/popular/categories/"),
+            (page) => ({ categories: page.results })
+        );
     },
 };
 
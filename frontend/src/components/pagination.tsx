@@ -7,7 +7,7 @@ import { Link, useLocation, useHistory } from "react-router-dom";
 import { Location } from "history";
 import Dropdown from "react-bootstrap/Dropdown";
 import { FontAwesomeIcon as FaIcon } from "@fortawesome/react-fontawesome";
-import { IconDefinition, faFire, faSun, faArrowUp } from "@fortawesome/free-solid-svg-icons";
+import { IconDefinition, faFire, faSun, faArrowUp, faSearch } from "@fortawesome/free-solid-svg-icons";
 import debugLog from "../debug";
 
 interface PaginationProps {
@@ -58,7 +58,7 @@ const Pagination = ({ pageSize, itemCount, label, top = false }: PaginationProps
             <Dropdown.Menu className="w-100 slight-bg">
                 <Dropdown.ItemText>Sort by</Dropdown.ItemText>
                 <Dropdown.Divider />
-                {Object.keys(orderingParams)
+                {sortOptions(urlParams)
                     .filter((option) => option !== currentSort)
                     .map((option) => {
                         urlParams.set("sort", option);
@@ -148,7 +148,7 @@ const Pagination = ({ pageSize, itemCount, label, top = false }: PaginationProps
             <div className="rounded py-2 px-3 sdark-fg">
                 <Navbar variant="dark" className="p-0">
                     <Nav>
-                        {Object.entries(orderingParams).map(([n, q]) => {
+                        {sortOptions(sortParams).map((n) => {
                             sortParams.set("sort", n);
                             return (
                                 <Nav.Item className={`px-2 me-2 ${n === currentSort ? currentSortIndicator : ""}`}>
@@ -202,13 +202,20 @@ const Pagination = ({ pageSize, itemCount, label, top = false }: PaginationProps
     //    </>
     //);
 };
-const getDefaultSort = (params: URLSearchParams) => params.get("sort") || "hot";
+// searches rank by text relevance blended with best by default
+const isSearch = (params: URLSearchParams) => params.has("q") || params.has("search");
+const getDefaultSort = (params: URLSearchParams, search = isSearch(params)) =>
+    params.get("sort") || (search ? "relevant" : "hot");
+const sortOptions = (params: URLSearchParams) =>
+    Object.keys(orderingParams).filter((option) => option !== "relevant" || isSearch(params));
 const orderingParams: { [s: string]: string } = {
+    relevant: "-relevance,-created_at",
     hot: "-hot,-best,-created_at",
     new: "-created_at",
     best: "-best,-created_at",
 };
 const orderingIcons: { [s: string]: IconDefinition } = {
+    relevant: faSearch,
     hot: faFire,
     new: faSun,
     best: faArrowUp,
@@ -267,7 +274,8 @@ export default Pagination;
 
 export const toApiQuery = (location: Location, query: object = {}) => {
     let urlParams = new URLSearchParams(location.search);
-    urlParams.set("ordering", orderingParams[getDefaultSort(urlParams)]);
+    const search = isSearch(urlParams) || "search" in query;
+    urlParams.set("ordering", orderingParams[getDefaultSort(urlParams, search)]);
     urlParams.delete("sort");
 
     Object.entries(query).forEach(([key, value]) => urlParams.set(key, value));
@@ -36,6 +36,14 @@ export interface BingoTile {
     hovered: boolean;
 }
 
+export interface GeneratedCard {
+    category: string;
+    seed: number;
+    version: number;
+    tiles: Pick<BingoTile, "id" | "text">[];
+    signature: string;
+}
+
 export interface BingoCard {
     name: string;
     tiles: BingoTile[];
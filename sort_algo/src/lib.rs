@@ -1,4 +1,5 @@
 use pyo3::prelude::*;
+use pyo3::exceptions::PyValueError;
 
 /*
 fn best_score_old(up: f64, total: f64) -> PyResult<f64> {
@@ -25,12 +26,9 @@ fn round(num: f64, place: i32) -> f64 {
     (num * rounder).trunc() / rounder
 }
 
-/// Calculates a post's best score using a Wilson Score function.
-#[pyfunction]
-#[pyo3(text_signature = "(up, total, /)")]
-fn best_score(up: f64, total: f64) -> PyResult<f64> {
+fn best(up: f64, total: f64) -> f64 {
     if total == 0.0 {
-        return Ok(0.0);
+        return 0.0;
     }
 
     let z = 1.281551565545; // 80% confidence
@@ -40,13 +38,10 @@ fn best_score(up: f64, total: f64) -> PyResult<f64> {
     let right = z * (p * (1.0 - p) / total + z * z / (4.0 * total * total)).sqrt();
     let under = 1.0 + 1.0 / total * z * z;
 
-    Ok((left - right) / under)
+    (left - right) / under
 }
 
-/// Calculates a post's hot score. `created_timestamp` is a unix timestamp.
-#[pyfunction]
-#[pyo3(text_signature = "(up, total, created_timestamp, /)")]
-fn hot_score(ups: f64, total: f64, created_timestamp: f64) -> PyResult<f64> {
+fn hot(ups: f64, total: f64, created_timestamp: f64) -> f64 {
     let score: f64 = total - (total - ups);
     let sign = if score > 0.0 {
         1.0 
@@ -60,7 +55,53 @@ fn hot_score(ups: f64, total: f64, created_timestamp: f64) -> PyResult<f64> {
     let seconds = created_timestamp - 1134028003.0;
     let result = sign * order + seconds / 45000.0;
 
-    Ok(round(result, 7))
+    round(result, 7)
+}
+
+fn check_lengths(lengths: &[usize]) -> PyResult<()> {
+    if lengths.iter().any(|&len| len != lengths[0]) {
+        return Err(PyValueError::new_err("all arguments must have the same length"));
+    }
+    Ok(())
+}
+
+/// Calculates a post's best score using a Wilson Score function.
+#[pyfunction]
+#[pyo3(text_signature = "(up, total, /)")]
+fn best_score(up: f64, total: f64) -> PyResult<f64> {
+    Ok(best(up, total))
+}
+
+/// Calculates a post's hot score. `created_timestamp` is a unix timestamp.
+#[pyfunction]
+#[pyo3(text_signature = "(up, total, created_timestamp, /)")]
+fn hot_score(ups: f64, total: f64, created_timestamp: f64) -> PyResult<f64> {
+    Ok(hot(ups, total, created_timestamp))
+}
+
+/// Calculates best scores for whole columns of posts in one call.
+#[pyfunction]
+#[pyo3(text_signature = "(ups, totals, /)")]
+fn best_scores(ups: Vec<f64>, totals: Vec<f64>) -> PyResult<Vec<f64>> {
+    check_lengths(&[ups.len(), totals.len()])?;
+
+    Ok(ups.iter()
+        .zip(totals.iter())
+        .map(|(&up, &total)| best(up, total))
+        .collect())
+}
+
+/// Calculates hot scores for whole columns of posts in one call.
+#[pyfunction]
+#[pyo3(text_signature = "(ups, totals, created_timestamps, /)")]
+fn hot_scores(ups: Vec<f64>, totals: Vec<f64>, created_timestamps: Vec<f64>) -> PyResult<Vec<f64>> {
+    check_lengths(&[ups.len(), totals.len(), created_timestamps.len()])?;
+
+    Ok(ups.iter()
+        .zip(totals.iter())
+        .zip(created_timestamps.iter())
+        .map(|((&up, &total), &timestamp)| hot(up, total, timestamp))
+        .collect())
 }
 
 /// A Python module implemented in Rust.
@@ -68,6 +109,8 @@ fn hot_score(ups: f64, total: f64, created_timestamp: f64) -> PyResult<f64> {
 fn libreddit_sort(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(hot_score, m)?)?;
     m.add_function(wrap_pyfunction!(best_score, m)?)?;
+    m.add_function(wrap_pyfunction!(hot_scores, m)?)?;
+    m.add_function(wrap_pyfunction!(best_scores, m)?)?;
 
     Ok(())
 }